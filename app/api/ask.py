@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 import logging
 import asyncio
@@ -18,6 +19,9 @@ logger = logging.getLogger("uvicorn")
 
 ask_router = APIRouter(prefix="/ask", tags=["Ask"])
 
+# Citation marker in a RAG answer, e.g. [3]
+_CITATION_RE = re.compile(r"\[(\d+)\]")
+
 
 async def _record_unanswered_no_docs_and_raise(
     db,
@@ -160,6 +164,84 @@ def highlight_documents(documents, output_dir: str, user_documents: list):
         except Exception as e:
             logger.error(f"Failed to process {abs_input_path}: {e}")
 
+
+async def _query_index_group(
+    index_id: str,
+    group: dict,
+    question: str,
+    company_id: str,
+):
+    """
+    Query a single index group with retry on "index not found".
+
+    Returns a ``RagIndexSegment``, or ``None`` when the index yielded no result.
+    Raises ``HTTPException(503)`` for RAG errors other than "not found".
+    """
+    pass_ids_str = ",".join(group["pass_ids"])
+    file_names = group["file_names"]
+
+    logger.info(f"Querying index {index_id} with {len(group['pass_ids'])} documents")
+
+    try:
+        # Add retry logic for index not found errors
+        max_retries = 3
+        retry_delay = 1  # seconds
+        rag_result = None
+
+        for attempt in range(max_retries):
+            try:
+                rag_result = await rag_query(
+                    pass_ids=pass_ids_str,
+                    question=question,
+                    file_names=file_names,
+                    company_id=company_id,
+                    index_id=index_id
+                )
+                break  # Success, exit retry loop
+            except RuntimeError as e:
+                error_str = str(e)
+                if "404" in error_str or "not found" in error_str.lower() or "index_not_found" in error_str.lower():
+                    if attempt < max_retries - 1:
+                        logger.warning(f"Index {index_id} not found (attempt {attempt + 1}/{max_retries}), retrying in {retry_delay}s...")
+                        await asyncio.sleep(retry_delay)
+                        retry_delay *= 2  # Exponential backoff
+                        continue
+                    else:
+                        logger.error(f"Index {index_id} not found after {max_retries} attempts")
+                        # Continue with other index groups instead of failing completely
+                        continue
+                else:
+                    raise  # Re-raise if it's a different error
+
+        if not rag_result:
+            logger.warning(f"No result from index {index_id}, skipping")
+            return None
+
+    except RuntimeError as rag_error:
+        # Log error but continue with other index groups
+        error_detail = str(rag_error)
+        logger.error(f"RAG query failed for index {index_id}: {error_detail}")
+        if "404" not in error_detail and "not found" not in error_detail.lower():
+            # Only raise if it's not a "not found" error (we'll handle those by skipping)
+            raise HTTPException(
+                status_code=503,
+                detail=f"RAG query service error: {error_detail}"
+            )
+        return None  # Skip this index group and use the others
+
+    # Parse RAG result for this index
+    answer_data = (
+        rag_result.get("result", [{}])[1]
+        if isinstance(rag_result.get("result"), list)
+        else rag_result.get("result", {})
+    )
+
+    answer_text = answer_data.get("data", "")
+    raw_docs = answer_data.get("documents", []) or rag_result.get("documents", [])
+
+    logger.info(f"Index {index_id}: Answer length={len(answer_text) if answer_text else 0}, Documents={len(raw_docs)}")
+    return RagIndexSegment(index_id=index_id, answer_text=answer_text or "", raw_docs=raw_docs)
+
 # --------------------------------------------------------------------------
 # Endpoint
 # --------------------------------------------------------------------------
@@ -201,8 +283,8 @@ async def ask_question(
         # Group documents by index_id since private and role-based documents use different indexes
         # Private documents: documentchat-{company_id}-{user_id}--{filename}
         # Role-based documents: documentchat-{company_id}-{admin_id}--{filename}
-        import re
         pass_ids_list = user_data["pass_ids"] if isinstance(user_data["pass_ids"], list) else user_data["pass_ids"].split(",")
+        index_id_re = re.compile(rf"(documentchat-{re.escape(company_id)}-[a-f0-9-]+)--")
         
         # Group pass_ids and documents by index_id
         index_groups = {}  # {index_id: {"pass_ids": [...], "file_names": [...], "documents": [...]}}
@@ -213,7 +295,7 @@ async def ask_question(
                 continue
                 
             # Extract index_id from format: documentchat-{company_id}-{user_id_or_admin_id}--{filename}
-            match = re.match(rf"(documentchat-{re.escape(company_id)}-[a-f0-9-]+)--", pass_id)
+            match = index_id_re.match(pass_id)
             if match:
                 index_id = match.group(1)
             else:
@@ -250,78 +332,28 @@ async def ask_question(
         # ------------------------------------------------------------------
         # Call RAG API for each index group and merge results
         # ------------------------------------------------------------------
-        rag_segment_results: list[RagIndexSegment] = []
-
-        for index_id, group in index_groups.items():
-            if not group["pass_ids"]:
-                continue
-                
-            pass_ids_str = ",".join(group["pass_ids"])
-            file_names = group["file_names"]
-            
-            logger.info(f"Querying index {index_id} with {len(group['pass_ids'])} documents")
-            
-            try:
-                # Add retry logic for index not found errors
-                max_retries = 3
-                retry_delay = 1  # seconds
-                rag_result = None
-                
-                for attempt in range(max_retries):
-                    try:
-                        rag_result = await rag_query(
-                            pass_ids=pass_ids_str,
-                            question=request.question,
-                            file_names=file_names,
-                            company_id=company_id,
-                            index_id=index_id
-                        )
-                        break  # Success, exit retry loop
-                    except RuntimeError as e:
-                        error_str = str(e)
-                        if "404" in error_str or "not found" in error_str.lower() or "index_not_found" in error_str.lower():
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Index {index_id} not found (attempt {attempt + 1}/{max_retries}), retrying in {retry_delay}s...")
-                                await asyncio.sleep(retry_delay)
-                                retry_delay *= 2  # Exponential backoff
-                                continue
-                            else:
-                                logger.error(f"Index {index_id} not found after {max_retries} attempts")
-                                # Continue to next index group instead of failing completely
-                                continue
-                        else:
-                            raise  # Re-raise if it's a different error
-                
-                if not rag_result:
-                    logger.warning(f"No result from index {index_id}, skipping")
-                    continue
-                    
-            except RuntimeError as rag_error:
-                # Log error but continue with other index groups
-                error_detail = str(rag_error)
-                logger.error(f"RAG query failed for index {index_id}: {error_detail}")
-                if "404" not in error_detail and "not found" not in error_detail.lower():
-                    # Only raise if it's not a "not found" error (we'll handle those by continuing)
-                    raise HTTPException(
-                        status_code=503,
-                        detail=f"RAG query service error: {error_detail}"
-                    )
-                continue  # Skip this index group and try others
-            
-            # Parse RAG result for this index
-            answer_data = (
-                rag_result.get("result", [{}])[1]
-                if isinstance(rag_result.get("result"), list)
-                else rag_result.get("result", {})
-            )
-            
-            answer_text = answer_data.get("data", "")
-            raw_docs = answer_data.get("documents", []) or rag_result.get("documents", [])
-            
-            logger.info(f"Index {index_id}: Answer length={len(answer_text) if answer_text else 0}, Documents={len(raw_docs)}")
-            rag_segment_results.append(
-                RagIndexSegment(index_id=index_id, answer_text=answer_text or "", raw_docs=raw_docs)
+        query_groups = [
+            (index_id, group) for index_id, group in index_groups.items() if group["pass_ids"]
+        ]
+        # Index groups are independent; query them concurrently (gather keeps order,
+        # which the citation offsets below rely on). If one group fails, cancel the
+        # others so their RAG calls and retry sleeps don't outlive the request.
+        query_tasks = [
+            asyncio.ensure_future(
+                _query_index_group(index_id, group, request.question, company_id)
             )
+            for index_id, group in query_groups
+        ]
+        try:
+            segment_results = await asyncio.gather(*query_tasks)
+        except BaseException:
+            for task in query_tasks:
+                task.cancel()
+            await asyncio.gather(*query_tasks, return_exceptions=True)
+            raise
+        rag_segment_results: list[RagIndexSegment] = [
+            seg for seg in segment_results if seg is not None
+        ]
 
         # Drop redundant per-index answers (e.g. "no information" when another index
         # cites evidence), then rebuild combined docs + offsets so [n] stays valid.
@@ -339,7 +371,6 @@ async def ask_question(
         # Merge answers and adjust citation numbers
         # Citations in each answer are relative to that query's document list (1-based)
         # We need to adjust them to be relative to the combined document list
-        import re
         merged_answer_parts = []
         
         for answer_text, offset, doc_count in all_answers_with_offsets:
@@ -351,7 +382,7 @@ async def ask_question(
                 adjusted_num = citation_num + offset
                 return f"[{adjusted_num}]"
             
-            adjusted_answer = re.sub(r'\[(\d+)\]', adjust_citation, answer_text)
+            adjusted_answer = _CITATION_RE.sub(adjust_citation, answer_text)
             merged_answer_parts.append(adjusted_answer)
             logger.info(f"Adjusted answer from offset {offset}: citations adjusted, answer length={len(adjusted_answer)}")
         
@@ -377,7 +408,7 @@ async def ask_question(
         # Parse citations from merged answer and filter documents
         # ------------------------------------------------------------------
         # Parse citations from answer text (e.g., [1], [2])
-        citation_matches = re.findall(r'\[(\d+)\]', answer_text)
+        citation_matches = _CITATION_RE.findall(answer_text)
         cited_indices = [int(match) - 1 for match in citation_matches]  # Convert to 0-based indices
         unique_cited_indices = sorted(set(cited_indices))  # Remove duplicates
         
@@ -5,6 +5,7 @@ from app.repositories.company_repo import CompanyRepository
 from app.models.company_admin_schema import RegisterRequest
 from app.deps.auth import get_keycloak_admin, ensure_role_exists
 from keycloak.exceptions import KeycloakGetError
+import asyncio
 import traceback
 import re
 
@@ -23,8 +24,10 @@ async def register_user(
         # -------------------------------------------------------------
         # 1. Must be invited (check MongoDB)
         # -------------------------------------------------------------
-        existing_admin = await repo.find_admin_by_email(payload.email)
-        existing_user = await repo.find_user_by_email(payload.email)
+        existing_admin, existing_user = await asyncio.gather(
+            repo.find_admin_by_email(payload.email),
+            repo.find_user_by_email(payload.email),
+        )
         invited_user = existing_admin or existing_user
 
         if not invited_user:
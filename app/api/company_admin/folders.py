@@ -375,7 +375,7 @@ async def list_importable_folders(
             "company_id": company_id,
             "admin_id": admin_id,
             "storage_path": {"$exists": True, "$ne": None}
-        }).to_list(length=None)
+        }, {"_id": 0, "storage_path": 1}).to_list(length=None)
         
         # Normalize storage paths for comparison (lowercase, strip trailing slashes)
         existing_storage_paths = set()
@@ -385,11 +385,12 @@ async def list_importable_folders(
                 # Normalize: lowercase, strip trailing slashes, strip leading/trailing whitespace
                 normalized = storage_path.lower().strip().rstrip("/")
                 existing_storage_paths.add(normalized)
-                logger.debug(f"Existing folder storage_path: '{storage_path}' -> normalized: '{normalized}'")
+                logger.debug("Existing folder storage_path: '%s' -> normalized: '%s'", storage_path, normalized)
         
         # Build response with import status
         folders_list = []
         normalized_company_id = company_id.lower()
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
         for folder_info in nextcloud_folders:
             folder_path = folder_info.get("path", "")
@@ -409,10 +410,11 @@ async def list_importable_folders(
             
             # Check if this folder is already imported by comparing normalized paths
             is_imported = normalized_path in existing_storage_paths
-            if is_imported:
-                logger.debug(f"Folder '{folder_path}' is already imported (normalized: '{normalized_path}')")
-            else:
-                logger.debug(f"Folder '{folder_path}' is not imported yet (normalized: '{normalized_path}', existing paths: {list(existing_storage_paths)[:5]}...)")
+            if debug_enabled:
+                if is_imported:
+                    logger.debug(f"Folder '{folder_path}' is already imported (normalized: '{normalized_path}')")
+                else:
+                    logger.debug(f"Folder '{folder_path}' is not imported yet (normalized: '{normalized_path}', existing paths: {list(existing_storage_paths)[:5]}...)")
             
             folders_list.append({
                 "path": folder_path,
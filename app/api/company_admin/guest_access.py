@@ -8,7 +8,7 @@ Handles all guest access/teamlid endpoints:
 
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from app.deps.auth import get_current_user
+from app.deps.auth import get_current_user, get_token_roles
 from app.deps.db import get_db
 from app.repositories.company_repo import CompanyRepository
 from app.repositories.constants import serialize_modules
@@ -183,7 +183,7 @@ async def get_guest_workspaces(
     backward-compatible clients.
     """
     email = user.get("email")
-    roles = user.get("realm_access", {}).get("roles", [])
+    roles = get_token_roles(user)
 
     if not email:
         raise HTTPException(status_code=400, detail="Missing email in token")
@@ -37,9 +37,10 @@ async def add_or_update_role(
     company_id = admin_context["company_id"]
     admin_id = admin_context["admin_id"]
     action = payload.action
+    modules = {name: m.dict(exclude={"name"}) for name, m in payload.modules.items()}
 
     try:
-        result = await repo.add_or_update_role(company_id, admin_id, payload.role_name, payload.folders, payload.modules, action)
+        result = await repo.add_or_update_role(company_id, admin_id, payload.role_name, payload.folders, modules, action)
         return result
     except Exception as e:
         logger.exception("Failed to add or update role")
@@ -6,12 +6,12 @@ all company admin domain routers.
 """
 
 import logging
-from typing import Literal, Optional, Set, Tuple
+from typing import Collection, Literal, Optional, Set, Tuple
 
 from bson import ObjectId
 
 from fastapi import Depends, Request, HTTPException
-from app.deps.auth import get_current_user, get_keycloak_admin, require_role
+from app.deps.auth import get_current_user, get_keycloak_admin, get_token_roles, require_role
 from app.deps.db import get_db
 from app.repositories.company_repo import CompanyRepository
 
@@ -109,7 +109,7 @@ async def resolve_email_membership_documents(
     db,
     *,
     email: str,
-    realm_roles: list,
+    realm_roles: Collection[str],
     selected_company_header: Optional[str],
 ) -> Tuple[dict, Literal["company_admin", "company_user"]]:
     """
@@ -416,7 +416,7 @@ async def get_admin_or_user_company_id(
             detail="Missing email in authentication token",
         )
 
-    roles = user.get("realm_access", {}).get("roles", [])
+    roles = get_token_roles(user)
     selected_company_header = request.headers.get("X-Selected-Company-Id")
 
     base_user, user_type = await resolve_email_membership_documents(
@@ -565,7 +565,7 @@ async def get_admin_company_id(
             detail="Missing email in authentication token",
         )
 
-    roles = user.get("realm_access", {}).get("roles", []) or []
+    roles = get_token_roles(user)
     selected_company_header = request.headers.get("X-Selected-Company-Id")
 
     full_admin, resolved_type = await resolve_email_membership_documents(
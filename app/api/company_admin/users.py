@@ -15,6 +15,7 @@ Handles all user-related endpoints:
 - GET /user - Get current user info
 """
 
+import asyncio
 import logging
 import os
 import json
@@ -124,10 +125,10 @@ async def add_user(
     try:
         if payload.company_role == "company_admin":
             name = getattr(payload, "name", None) or payload.email.split("@")[0]
-            # Convert modules list to dict for add_admin (only company-enabled modules are applied in repo)
+            # Module configs for add_admin (only company-enabled modules are applied in repo)
             modules_dict = None
             if payload.modules:
-                modules_dict = {m.name: {"enabled": m.enabled, "desc": m.desc or ""} for m in payload.modules}
+                modules_dict = {name: {"enabled": m.enabled, "desc": m.desc or ""} for name, m in payload.modules.items()}
             assigning = await db.company_admins.find_one({"company_id": company_id, "user_id": admin_id})
             assigner_mods = (assigning or {}).get("modules")
             new_admin = await repo.add_admin(
@@ -433,7 +434,7 @@ async def assign_user_modules(
     admin_doc = await db.company_admins.find_one({"company_id": company_id, "user_id": user_id})
     if not admin_doc:
         raise HTTPException(status_code=404, detail="Admin not found or not in your company")
-    modules_dict = {m.name: {"enabled": m.enabled, "desc": m.desc or ""} for m in payload.modules}
+    modules_dict = {name: {"enabled": m.enabled, "desc": m.desc or ""} for name, m in payload.modules.items()}
     assigning = await db.company_admins.find_one({"company_id": company_id, "user_id": admin_context["admin_id"]})
     assigner_mods = (assigning or {}).get("modules")
     result = await repo.assign_modules(company_id, user_id, modules_dict, assigner_admin_modules=assigner_mods)
@@ -460,11 +461,22 @@ async def delete_user(
     deleted_admins_count = 0
     failed_deletions = []
 
+    # Resolve every requested id in two queries instead of one or two per id
+    id_filter = {"company_id": company_id, "user_id": {"$in": list(set(user_ids_list))}}
+    users_by_id, admins_by_id = {}, {}
+    user_records, admin_records = await asyncio.gather(
+        db.company_users.find(id_filter).to_list(None),
+        db.company_admins.find(id_filter).to_list(None),
+    )
+    for record in user_records:
+        users_by_id.setdefault(record["user_id"], record)
+    for record in admin_records:
+        admins_by_id.setdefault(record["user_id"], record)
+
     for user_id in user_ids_list:
-        user = await db.company_users.find_one({
-            "company_id": company_id,
-            "user_id": user_id
-        })
+        # A record is dropped from the maps only once it was actually deleted,
+        # so a repeated id is looked up again after a failed or refused delete
+        user = users_by_id.get(user_id)
 
         if user:
             logger.info(f"USER TO DELETE: {user}")
@@ -483,15 +495,14 @@ async def delete_user(
             try:
                 count = await repo.delete_users(company_id, [user_id], admin_id)
                 deleted_users_count += count
+                if count:
+                    users_by_id.pop(user_id, None)
             except Exception as e:
                 logger.error(f"Failed to delete user {user_id}: {str(e)}")
                 failed_deletions.append(user_id)
         
         else:
-            admin = await db.company_admins.find_one({
-                "company_id": company_id,
-                "user_id": user_id
-            })
+            admin = admins_by_id.get(user_id)
             
             if admin:
                 logger.info(f"ADMIN TO DELETE: {admin}")
@@ -511,6 +522,7 @@ async def delete_user(
                     success = await repo.delete_admin(company_id, user_id, admin_id)
                     if success:
                         deleted_admins_count += 1
+                        admins_by_id.pop(user_id, None)
                 except HTTPException as e:
                     logger.error(f"Failed to delete admin {user_id}: {e.detail}")
                     failed_deletions.append(user_id)
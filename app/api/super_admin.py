@@ -1,13 +1,16 @@
 import os
 import shutil
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 from app.deps.auth import require_role, get_keycloak_admin
 from app.deps.db import get_db
 from app.repositories.company_repo import CompanyRepository
 from app.repositories.document_repo import DocumentRepository
+from app.repositories.modules_repo import invalidate_company_modules
+from app.repositories.company_core_repo import announce_companies_listing_change, invalidate_companies_listing
 from app.models.company_admin_schema import CompanyCreate, CompanyAddAdmin, CompanyAdminModules, CompanyReAssignAdmin, CompanyModulesUpdate
 from app.deps.auth import ensure_role_exists
 
@@ -16,7 +19,28 @@ from fastapi.concurrency import run_in_threadpool
 logger = logging.getLogger(__name__)
 
 
-super_admin_router = APIRouter(prefix="/super-admin", tags=["Super Admin"])
+async def _invalidate_companies_listing_on_write(request: Request, db=Depends(get_db)):
+    """
+    Every mutating super-admin route drops this worker's cached company listing
+    before it runs (so in-flight rebuilds are not cached) and, once it is done,
+    invalidates the listing in every worker (some routes write to the
+    collections directly rather than through the repository).
+    """
+    if request.method == "GET":
+        yield
+        return
+    invalidate_companies_listing()
+    try:
+        yield
+    finally:
+        await announce_companies_listing_change(db)
+
+
+super_admin_router = APIRouter(
+    prefix="/super-admin",
+    tags=["Super Admin"],
+    dependencies=[Depends(_invalidate_companies_listing_on_write)],
+)
 
 UPLOAD_ROOT = "/app/uploads"
 UPLOAD_SUBFOLDERS = ["documents", "bkr", "vgc", "3-uurs"]
@@ -61,7 +85,9 @@ async def get_companies(
 ):
     repo = CompanyRepository(db)
     companies = await repo.get_all_companies()
-    return companies
+    # The listing holds only JSON-native values, so hand it to orjson directly
+    # instead of letting FastAPI walk the whole tree with jsonable_encoder first
+    return ORJSONResponse(companies)
 
 
 @super_admin_router.get("/roles/count")
@@ -281,7 +307,7 @@ async def add_company_admin(
     db=Depends(get_db),
 ):
     repo = CompanyRepository(db)
-    modules = {m.name: m.dict() for m in payload.modules}
+    modules = {name: m.dict() for name, m in payload.modules.items()}
     
     admin_id = user.get("sub", "super_admin")
 
@@ -344,7 +370,7 @@ async def assign_modules(
     db=Depends(get_db),
 ):
     repo = CompanyRepository(db)
-    modules_dict = {m.name: {"enabled": m.enabled} for m in payload.modules}
+    modules_dict = {name: {"enabled": m.enabled} for name, m in payload.modules.items()}
 
     result = await repo.assign_modules(company_id, admin_id, modules_dict)
     if not result:
@@ -463,6 +489,7 @@ async def delete_company(
 
     # 7) finally remove company record
     result = await db.companies.delete_one({"company_id": company_id})
+    invalidate_company_modules(company_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Company not found")
 
@@ -1,12 +1,14 @@
 import os
-from dotenv import load_dotenv
 
 # Try to load .env.local if it exists (for local development)
-# In production, environment variables should be set directly
-try:
-    load_dotenv(".env.local")
-except:
-    pass  # .env.local might not exist in production
+# In production (DAVI_ENV=production), environment variables are injected by the
+# orchestrator (docker compose env_file / systemd EnvironmentFile), so skip dotenv.
+if os.getenv("DAVI_ENV") != "production":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(".env.local")
+    except:
+        pass  # .env.local might not exist
 
 # Keycloak Configuration
 KEYCLOAK_HOST = os.getenv("KEYCLOAK_HOST", "http://host.docker.internal:8080")
@@ -4,6 +4,19 @@ import os
 from rapidfuzz import fuzz
 import tempfile
 import shutil
+from itertools import accumulate
+
+
+_RE_SPEAKER_TURN = re.compile(r'(?=\s[AB]:)')
+_RE_SPEAKER_PREFIX = re.compile(r"^[AB]:")
+_RE_SENTENCE_END = re.compile(r'(?<=[.?!])\s+(?=[A-Z])')
+_RE_NUMBERED_HEADER = re.compile(r'(?=\s*\d{1,2}[.)]\s+)')
+_RE_QUOTE_SPACE = re.compile(r'([”“]) ')
+
+# One TextPage per page serves both get_text("text") and search_for, so it is
+# built with search_for's own default flags: ligatures (fi, ffi, ...) are
+# expanded and hyphenated words joined, for exact search and fuzzy matching alike
+_TEXTPAGE_FLAGS = fitz.TEXTFLAGS_SEARCH
 
 
 def split_snippet(snippet_text):
@@ -20,55 +33,68 @@ def split_snippet(snippet_text):
     # Normalize
     snippet_text = snippet_text.replace("\f", " ").replace("\n", " ").strip()
 
-    # Step 1: Break on speaker turns (e.g., A: "...", B: "...")
-    dialogue_chunks = re.split(r'(?=\s[AB]:)', snippet_text)
-
-    segments = []
-    buffer = ""
+    final_segments = []
 
-    for chunk in dialogue_chunks:
-        if not chunk or not isinstance(chunk, str):
+    def emit(seg):
+        # Split on numbered headers and append cleaned, non-empty parts
+        if not seg:
+            return
+        for part in _RE_NUMBERED_HEADER.split(seg):
+            part = part.strip()
+            if part:
+                part = _RE_QUOTE_SPACE.sub(r"\1", part).strip()
+                if part:
+                    final_segments.append(part)
+
+    def flush(buffer):
+        # Non-dialogue text is split on sentence boundaries
+        for seg in _RE_SENTENCE_END.split(" ".join(buffer).strip()):
+            emit(seg)
+
+    # Single pass over speaker turns (e.g., A: "...", B: "..."); text between
+    # turns is collected and flushed on the next turn or at the end.
+    buffer = []
+    for chunk in _RE_SPEAKER_TURN.split(snippet_text):
+        if not chunk:
             continue
         chunk = chunk.strip()
-        if re.match(r"^[AB]:", chunk):
+        if _RE_SPEAKER_PREFIX.match(chunk):
             if buffer:
-                segments.extend(re.split(r'(?<=[.?!])\s+(?=[A-Z])', buffer.strip()))
-                buffer = ""
-            segments.append(chunk)
+                flush(buffer)
+                buffer = []
+            emit(chunk)
         else:
-            buffer += " " + chunk
+            buffer.append(chunk)
 
     if buffer:
-        segments.extend(re.split(r'(?<=[.?!])\s+(?=[A-Z])', buffer.strip()))
-
-    # Step 2: Further split long paragraphs on sentence end or numbered headers
-    final_segments = []
-    for seg in segments:
-        if not seg or not isinstance(seg, str):
-            continue
-        numbered = re.split(r'(?=\s*\d{1,2}[.)]\s+)', seg)
-        for part in numbered:
-            part = part.strip()
-            if part:
-                final_segments.append(part.replace("” ", "”").replace("“ ", "“").strip())
+        flush(buffer)
 
-    return [s for s in final_segments if s]
+    return final_segments
 
 
 def find_best_window_match(page_text, full_snippet, window_margin=10, threshold=60):
     full_words = full_snippet.strip().split()
     text_words = page_text.strip().split()
     target_len = len(full_words)
+    target_chars = len(full_snippet)
     best_score = 0
     best_trimmed = ""
 
+    # Prefix sums of word lengths give each window's joined length in O(1)
+    word_len_prefix = [0, *accumulate(len(w) for w in text_words)]
+
     for size in range(target_len - window_margin, target_len + window_margin + 1, 2):
         if size <= 0 or size > len(text_words):
             continue
         for i in range(0, len(text_words) - size + 1, 2):
-            window_words = text_words[i:i + size]
-            window = " ".join(window_words)
-            score = fuzz.ratio(full_snippet, window)
+            # fuzz.ratio can never exceed 200 * min(len) / (len_a + len_b), so
+            # windows whose length alone rules out a better score are skipped.
+            win_chars = word_len_prefix[i + size] - word_len_prefix[i] + size - 1
+            cutoff = max(threshold, best_score)
+            if 200 * min(target_chars, win_chars) < cutoff * (target_chars + win_chars):
+                continue
+            window = " ".join(text_words[i:i + size])
+            score = fuzz.ratio(full_snippet, window, score_cutoff=cutoff)
             if score > best_score:
                 best_score = score
                 best_trimmed = window
@@ -78,8 +104,8 @@ def find_best_window_match(page_text, full_snippet, window_margin=10, threshold=
     return best_trimmed if best_score >= threshold else None
 
 
-def highlight_text(page, text):
-    found = page.search_for(text)
+def highlight_text(page, text, textpage=None):
+    found = page.search_for(text, textpage=textpage)
     if not found:
         return False
     for rect in found:
@@ -112,19 +138,28 @@ def find_and_highlight(pdf_path, snippet_text, target_page, output_path):
     best_text_block = ""
     best_score = 0
 
+    # One TextPage per candidate page, shared by get_text and search_for so the
+    # layout analysis runs once. Dehyphenation matches search_for's defaults.
+    # PyMuPDF is not thread-safe, so extraction stays on the calling thread.
+    pages = {}
+    textpages = {}
+    page_texts = {}
+
     for i in range(target_page - 1, target_page + 2):
-        if 0 <= i < total_pages:
-            page = doc[i]
-            page_text = page.get_text()
-            text_block = find_best_window_match(page_text, full_snippet)
-            if text_block:
-                score = fuzz.ratio(full_snippet, text_block)
-                if score > best_score:
-                    best_score = score
-                    best_page_index = i
-                    best_text_block = text_block
-                if best_score >= 95:
-                    break
+        if not 0 <= i < total_pages:
+            continue
+        page = pages[i] = doc[i]
+        textpages[i] = page.get_textpage(flags=_TEXTPAGE_FLAGS)
+        page_texts[i] = page.get_text("text", textpage=textpages[i])
+        text_block = find_best_window_match(page_texts[i], full_snippet)
+        if text_block:
+            score = fuzz.ratio(full_snippet, text_block)
+            if score > best_score:
+                best_score = score
+                best_page_index = i
+                best_text_block = text_block
+            if best_score >= 95:
+                break
 
     if best_page_index == -1 or not best_text_block:
         print("⚠️ No matching text found — exporting original PDF.")
@@ -135,18 +170,21 @@ def find_and_highlight(pdf_path, snippet_text, target_page, output_path):
             highlight_end = min(len(segments) - 1, matched[-1] + 1)
             highlight_text_to_search = " ".join(segments[highlight_start:highlight_end + 1])
 
-            best_page = doc[best_page_index]
-            if not highlight_text(best_page, highlight_text_to_search):
+            best_page = pages[best_page_index]
+            best_textpage = textpages[best_page_index]
+            if not highlight_text(best_page, highlight_text_to_search, best_textpage):
                 print("⚠️ Exact match not found. Falling back to fuzzy window match.")
-                fallback = find_best_window_match(best_page.get_text(), highlight_text_to_search)
+                fallback = find_best_window_match(page_texts[best_page_index], highlight_text_to_search)
                 if fallback:
-                    highlight_text(best_page, fallback)
+                    highlight_text(best_page, fallback, best_textpage)
                     print("✅ Fuzzy fallback matched and highlighted.")
                 else:
                     print("⚠️ Highlight failed — exporting original.")
         else:
             print("⚠️ No fuzzy match — exporting original.")
 
+    textpages.clear()
+    pages.clear()
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     doc.save(output_path, incremental=False, garbage=1, deflate=False)
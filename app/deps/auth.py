@@ -1,10 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from typing import Annotated
+import asyncio
+import hashlib
+import httpx
 import jwt
-import requests
+import orjson
 import os
+import threading
+import time
 
+from cachetools import TTLCache
 from jwt import algorithms
 from keycloak import KeycloakAdmin
 from app.core.config import (
@@ -15,8 +22,6 @@ from app.core.config import (
     KEYCLOAK_VERIFY_SSL
 )
 
-app = FastAPI()
-
 # Validate required configuration
 if not KEYCLOAK_HOST:
     raise ValueError("KEYCLOAK_HOST environment variable is required")
@@ -28,6 +33,13 @@ JWKS_URL = f"{KEYCLOAK_HOST}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/cer
 TOKEN_URL = f"{KEYCLOAK_HOST}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/token"
 AUTH_URL = f"{KEYCLOAK_HOST}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/auth"
 
+# --- HTTP client (reuses pooled keep-alive connections to Keycloak) ---
+_http = httpx.AsyncClient(
+    timeout=10.0,
+    verify=KEYCLOAK_VERIFY_SSL,
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+)
+
 # --- OAuth2 ---
 oauth_2_scheme = OAuth2AuthorizationCodeBearer(
     tokenUrl=TOKEN_URL,
@@ -35,61 +47,62 @@ oauth_2_scheme = OAuth2AuthorizationCodeBearer(
 )
 
 # --- Keycloak Admin Client ---
-keycloak_admin = KeycloakAdmin(
-    server_url=f"{KEYCLOAK_HOST}/",
-    realm_name=KEYCLOAK_REALM,  # target realm
-    client_id=DAVI_KEYCLOAK_CLIENT_ID,
-    client_secret_key=DAVI_KEYCLOAK_CLIENT_SECRET,
-    verify=KEYCLOAK_VERIFY_SSL,
-)
-
+# One shared instance per process: python-keycloak caches the admin token and
+# refreshes it itself before expiry, and reuses its HTTP connection pool.
 _kc_admin = None
+_kc_admin_lock = threading.Lock()
+
 
 def get_keycloak_admin():
     global _kc_admin
     if _kc_admin is None:
-        _kc_admin = KeycloakAdmin(
-            server_url=f"{KEYCLOAK_HOST}/",
-            realm_name=KEYCLOAK_REALM,  
-            client_id=DAVI_KEYCLOAK_CLIENT_ID,
-            client_secret_key=DAVI_KEYCLOAK_CLIENT_SECRET,
-            verify=KEYCLOAK_VERIFY_SSL,
-        )
+        with _kc_admin_lock:
+            if _kc_admin is None:
+                _kc_admin = KeycloakAdmin(
+                    server_url=f"{KEYCLOAK_HOST}/",
+                    realm_name=KEYCLOAK_REALM,  # target realm
+                    client_id=DAVI_KEYCLOAK_CLIENT_ID,
+                    client_secret_key=DAVI_KEYCLOAK_CLIENT_SECRET,
+                    verify=KEYCLOAK_VERIFY_SSL,
+                )
     return _kc_admin
 
-# --- Helpers for JWT validation ---
-def get_signing_key(token: str):
+
+async def warm_up_keycloak():
+    """
+    Fetch and cache the JWKS before the first request arrives.
+    Failures are logged only; the first authenticated request will retry.
+    """
     try:
-        response = requests.get(JWKS_URL, timeout=10, verify=KEYCLOAK_VERIFY_SSL)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        jwks = response.json()
-        
-        # Validate JWKS structure
-        if not isinstance(jwks, dict) or "keys" not in jwks:
-            error_detail = f"Invalid JWKS response from Keycloak. Expected 'keys' field. Got: {list(jwks.keys()) if isinstance(jwks, dict) else type(jwks).__name__}"
-            print(f"ERROR: {error_detail}. Full response: {jwks}")
-            raise HTTPException(
-                status_code=502,
-                detail=f"Keycloak JWKS endpoint returned invalid format: {error_detail}"
-            )
-        
-        if not isinstance(jwks["keys"], list) or len(jwks["keys"]) == 0:
-            raise HTTPException(
-                status_code=502,
-                detail="Keycloak JWKS endpoint returned no keys"
-            )
-        
-        unverified_header = jwt.get_unverified_header(token)
-        kid = unverified_header.get("kid")
+        await _get_public_keys()
+    except HTTPException as e:
+        print(f"WARNING: Keycloak warm-up failed for {JWKS_URL}: {e.detail}")
 
-        for key in jwks["keys"]:
-            if key["kid"] == kid and key.get("use") == "sig" and key.get("alg") == "RS256":
-                public_key = algorithms.RSAAlgorithm.from_jwk(key)
-                return public_key
 
-        raise HTTPException(status_code=401, detail="Invalid token: signing key not found")
-    
-    except requests.exceptions.RequestException as e:
+async def close_http_client():
+    """Close the pooled Keycloak HTTP client (call on application shutdown)."""
+    await _http.aclose()
+
+
+# --- Helpers for JWT validation ---
+
+# JWKS public keys are parsed once and cached in-process by kid; Keycloak rotates
+# keys rarely, and an unknown kid triggers one forced refresh (rate limited so
+# bogus kids can't hammer Keycloak).
+JWKS_CACHE_TTL_SECONDS = 300
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = 30
+
+_jwks_cache = TTLCache(maxsize=2, ttl=JWKS_CACHE_TTL_SECONDS)
+_jwks_lock = asyncio.Lock()
+_jwks_fetched_at = 0.0
+
+
+async def _fetch_jwks() -> dict:
+    try:
+        response = await _http.get(JWKS_URL)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        jwks = orjson.loads(response.content)
+    except httpx.HTTPError as e:
         print(f"ERROR: Failed to fetch JWKS from {JWKS_URL}: {str(e)}")
         raise HTTPException(
             status_code=502,
@@ -102,20 +115,120 @@ def get_signing_key(token: str):
             detail=f"Keycloak JWKS endpoint returned invalid JSON: {str(e)}"
         )
 
+    # Validate JWKS structure
+    if not isinstance(jwks, dict) or "keys" not in jwks:
+        error_detail = f"Invalid JWKS response from Keycloak. Expected 'keys' field. Got: {list(jwks.keys()) if isinstance(jwks, dict) else type(jwks).__name__}"
+        print(f"ERROR: {error_detail}. Full response: {jwks}")
+        raise HTTPException(
+            status_code=502,
+            detail=f"Keycloak JWKS endpoint returned invalid format: {error_detail}"
+        )
+
+    if not isinstance(jwks["keys"], list) or len(jwks["keys"]) == 0:
+        raise HTTPException(
+            status_code=502,
+            detail="Keycloak JWKS endpoint returned no keys"
+        )
+
+    return jwks
+
+
+def _build_public_keys(jwks: dict) -> dict:
+    """Parse the RS256 signing keys of a JWKS once, keyed by kid."""
+    public_keys = {}
+    for key in jwks["keys"]:
+        if key.get("use") != "sig" or key.get("alg") != "RS256":
+            continue
+        try:
+            public_keys[key["kid"]] = algorithms.RSAAlgorithm.from_jwk(key)
+        except (KeyError, jwt.PyJWTError) as e:
+            print(f"WARNING: Skipping unusable JWKS key {key.get('kid')}: {str(e)}")
+    return public_keys
+
+
+async def _get_public_keys(force_refresh: bool = False) -> dict:
+    global _jwks_fetched_at
+    async with _jwks_lock:
+        public_keys = _jwks_cache.get("public_keys")
+        if force_refresh and time.monotonic() - _jwks_fetched_at >= JWKS_MIN_REFRESH_INTERVAL_SECONDS:
+            public_keys = None
+        if public_keys is None:
+            public_keys = _build_public_keys(await _fetch_jwks())
+            _jwks_cache["public_keys"] = public_keys
+            _jwks_fetched_at = time.monotonic()
+        return public_keys
+
+
+async def get_signing_key(token: str):
+    unverified_header = jwt.get_unverified_header(token)
+    kid = unverified_header.get("kid")
+
+    public_key = (await _get_public_keys()).get(kid)
+    if public_key is None:
+        # Unknown kid: Keycloak may have rotated its keys since we cached them
+        public_key = (await _get_public_keys(force_refresh=True)).get(kid)
+    if public_key is None:
+        raise HTTPException(status_code=401, detail="Invalid token: signing key not found")
+    return public_key
+
+
+# Decoder with its verification options merged once instead of on every call.
+# Keys passed in are already-parsed RSAPublicKey objects, so PyJWT uses them as-is.
+_JWT_ALGORITHMS = ("RS256",)
+_jwt_decoder = jwt.PyJWT(options={"verify_exp": True})
+
+
+# Verified token payloads keyed by sha256(token), so repeated requests with the
+# same bearer token skip signature verification. Entries never outlive the
+# token's own expiry (checked on read with a small safety margin).
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_EXP_MARGIN_SECONDS = 5
+
+_token_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+
+def _get_cached_payload(cache_key: bytes):
+    payload = _token_cache.get(cache_key)
+    if payload is None:
+        return None
+    exp = payload.get("exp")
+    if exp is None or exp <= time.time() + TOKEN_CACHE_EXP_MARGIN_SECONDS:
+        _token_cache.pop(cache_key, None)
+        return None
+    # Shallow copy so callers can't mutate the cached entry
+    return dict(payload)
+
+
+async def get_current_user(
+    request: Request,
+    token: Annotated[str, Depends(oauth_2_scheme)],
+):
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached_payload = _get_cached_payload(cache_key)
+    if cached_payload is not None:
+        # Shared with the activity-tracking middleware (avoids a second decode)
+        request.state.user = cached_payload
+        return cached_payload
 
-async def get_current_user(token: Annotated[str, Depends(oauth_2_scheme)]):
     try:
-        public_key = get_signing_key(token)
+        public_key = await get_signing_key(token)
 
-        payload = jwt.decode(
+        # RSA signature verification is CPU-bound; keep it off the event loop
+        payload = await run_in_threadpool(
+            _jwt_decoder.decode,
             token,
             public_key,
-            algorithms=["RS256"],
-            options={"verify_exp": True},
+            algorithms=_JWT_ALGORITHMS,
             audience="account",
         )
         # Include raw token for Nextcloud authentication
         payload["_raw_token"] = token
+        # Realm roles as a frozenset, built once and reused by every role check
+        payload["_roles_set"] = frozenset(payload.get("realm_access", {}).get("roles", []))
+        # The cache is only touched from the event loop thread, so no lock is needed
+        _token_cache[cache_key] = payload
+        payload = dict(payload)
+        request.state.user = payload
         return payload
 
     except jwt.ExpiredSignatureError:
@@ -124,9 +237,17 @@ async def get_current_user(token: Annotated[str, Depends(oauth_2_scheme)]):
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
 
+def get_token_roles(user: dict) -> frozenset:
+    """Realm roles of a token payload from ``get_current_user``."""
+    roles = user.get("_roles_set")
+    if roles is None:
+        roles = frozenset(user.get("realm_access", {}).get("roles", []))
+    return roles
+
+
 def require_role(required_role: str):
     def role_checker(user=Depends(get_current_user)):
-        roles = user.get("realm_access", {}).get("roles", [])
+        roles = get_token_roles(user)
         if required_role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -136,9 +257,35 @@ def require_role(required_role: str):
     return role_checker
 
 
+# Realm role names, refreshed at most once per minute
+_realm_roles_cache = TTLCache(maxsize=1, ttl=60)
+
+
+def _get_realm_role_names() -> set:
+    role_names = _realm_roles_cache.get("roles")
+    if role_names is None:
+        role_names = {role["name"] for role in get_keycloak_admin().get_realm_roles()}
+        _realm_roles_cache["roles"] = role_names
+    return role_names
+
+
+# Role representations already confirmed to exist, re-checked hourly
+_known_roles = TTLCache(maxsize=256, ttl=3600)
+_known_roles_lock = threading.Lock()
+
+
 def ensure_role_exists(role_name: str):
-    try:
-        return keycloak_admin.get_realm_role(role_name)
-    except:
-        keycloak_admin.create_realm_role({"name": role_name})
-        return keycloak_admin.get_realm_role(role_name)
+    with _known_roles_lock:
+        known_role = _known_roles.get(role_name)
+    if known_role is not None:
+        return known_role
+
+    kc_admin = get_keycloak_admin()
+    if role_name not in _get_realm_role_names():
+        kc_admin.create_realm_role({"name": role_name}, skip_exists=True)
+        _realm_roles_cache.pop("roles", None)
+    role = kc_admin.get_realm_role(role_name)
+
+    with _known_roles_lock:
+        _known_roles[role_name] = role
+    return role
@@ -2,9 +2,8 @@ from typing import Optional
 from fastapi import Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from app.deps.auth import get_current_user
+from app.deps.auth import get_current_user, get_token_roles
 from app.deps.db import get_db
-from app.repositories.company_repo import CompanyRepository
 
 
 class GuestPermissions(BaseModel):
@@ -24,6 +23,54 @@ class RequestContext(BaseModel):
     guest_permissions: Optional[GuestPermissions]
 
 
+# Only the fields get_request_context reads from the user record
+_USER_CONTEXT_PROJECTION = {"_id": 0, "user_id": 1, "company_id": 1, "added_by_admin_id": 1}
+
+
+async def _find_user_with_guest_access(coll, email: str, acting_owner_id: Optional[str]):
+    """
+    Fetch the user record by email. When an acting owner is requested, the
+    matching active guest-access entry is joined in the same round-trip and
+    returned alongside (``None`` if there is none).
+    """
+    if not acting_owner_id:
+        return await coll.find_one({"email": email}, _USER_CONTEXT_PROJECTION), None
+
+    pipeline = [
+        {"$match": {"email": email}},
+        {"$limit": 1},
+        {"$project": _USER_CONTEXT_PROJECTION},
+        {
+            "$lookup": {
+                "from": "company_guest_access",
+                "let": {"company_id": "$company_id", "user_id": "$user_id"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "owner_admin_id": acting_owner_id,
+                            "is_active": True,
+                            "$expr": {
+                                "$and": [
+                                    {"$eq": ["$company_id", "$$company_id"]},
+                                    {"$eq": ["$guest_user_id", "$$user_id"]},
+                                ]
+                            },
+                        }
+                    },
+                    {"$limit": 1},
+                ],
+                "as": "_guest_access",
+            }
+        },
+    ]
+    rows = await coll.aggregate(pipeline).to_list(1)
+    if not rows:
+        return None, None
+    base_user = rows[0]
+    guest_entries = base_user.pop("_guest_access", [])
+    return base_user, (guest_entries[0] if guest_entries else None)
+
+
 async def get_request_context(
     request: Request,
     token: dict = Depends(get_current_user),
@@ -36,27 +83,26 @@ async def get_request_context(
       - whether it's guest mode, and
       - what guest permissions apply.
     """
-    repo = CompanyRepository(db)
-
     email = token.get("email")
-    roles = token.get("realm_access", {}).get("roles", [])
+    roles = get_token_roles(token)
 
     if not email:
         raise HTTPException(status_code=400, detail="Missing email in token")
 
-    # Resolve real user record
-    base_user = None
-    user_type = None
-
     if "company_admin" in roles:
-        base_user = await db.company_admins.find_one({"email": email})
+        coll = db.company_admins
         user_type = "company_admin"
     elif "company_user" in roles:
-        base_user = await db.company_users.find_one({"email": email})
+        coll = db.company_users
         user_type = "company_user"
     else:
         raise HTTPException(status_code=403, detail="Unsupported role for this feature")
 
+    acting_owner_id = request.headers.get("X-Acting-Owner-Id")
+
+    # Resolve real user record (plus the guest-access entry when an acting owner is requested)
+    base_user, guest_entry = await _find_user_with_guest_access(coll, email, acting_owner_id)
+
     if not base_user:
         raise HTTPException(status_code=404, detail="User not found in backend")
 
@@ -72,19 +118,12 @@ async def get_request_context(
         else base_user.get("added_by_admin_id", base_user["user_id"])
     )
 
-    acting_owner_id = request.headers.get("X-Acting-Owner-Id")
-
     is_guest_mode = False
     guest_permissions: Optional[GuestPermissions] = None
     owner_admin_id = default_owner_admin_id
 
     # If a different owner is requested -> guest mode
     if acting_owner_id and acting_owner_id != default_owner_admin_id:
-        guest_entry = await repo.get_guest_access(
-            company_id=company_id,
-            guest_user_id=base_user_id,
-            owner_admin_id=acting_owner_id,
-        )
         if not guest_entry:
             raise HTTPException(status_code=403, detail="No guest access for this workspace")
 
@@ -111,19 +150,22 @@ async def get_request_context(
                     return _to_bool(old_value)
             return False
         
-        guest_permissions = GuestPermissions(
+        # Values are already bools; skip pydantic validation on the hot path
+        guest_permissions = GuestPermissions.construct(
             role_write=_get_guest_permission(guest_entry, "can_role_write"),
             user_write=_get_guest_permission(guest_entry, "can_user_write", "can_user_read"),
             document_write=_get_guest_permission(guest_entry, "can_document_write", "can_document_read"),
             folder_write=_get_guest_permission(guest_entry, "can_folder_write"),
         )
 
-    return RequestContext(
+    # All fields come from the verified token and our own DB records, so build
+    # the model without validation; ids are normalized to str as validation did.
+    return RequestContext.construct(
         token=token,
         user_type=user_type,
-        user_id=base_user_id,
-        company_id=company_id,
-        owner_admin_id=owner_admin_id,
+        user_id=str(base_user_id),
+        company_id=str(company_id),
+        owner_admin_id=str(owner_admin_id),
         is_guest_mode=is_guest_mode,
         guest_permissions=guest_permissions,
     )
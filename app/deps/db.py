@@ -1,11 +1,85 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import Depends
+from pymongo import monitoring
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/DAVI")
 DB_NAME = os.getenv("DB_NAME", "DAVI")
 
-client = AsyncIOMotorClient(MONGO_URI)
+# Connection pool tuning (per worker process). Requests issue at most a handful
+# of concurrent queries (e.g. the super-admin company listing runs 7 at once),
+# so 100 connections per worker leave ample headroom; raise it only if slow
+# checkouts show up in the log below.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+# Log pool checkouts that waited at least this long (0 disables the listener)
+MONGO_LOG_POOL_WAIT_MS = int(os.getenv("MONGO_LOG_POOL_WAIT_MS", "0"))
+# Optional wire compression, e.g. "zstd,zlib" ("zstd" needs the zstandard package)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+_client_options = dict(
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+)
+if MONGO_COMPRESSORS:
+    _client_options["compressors"] = MONGO_COMPRESSORS
+
+
+class _SlowCheckoutLogger(monitoring.ConnectionPoolListener):
+    """Reports requests that had to wait for a pooled connection."""
+
+    def __init__(self, threshold_ms: int):
+        self.threshold_ms = threshold_ms
+
+    def connection_checked_out(self, event):
+        waited_ms = event.duration * 1000
+        if waited_ms >= self.threshold_ms:
+            print(f"WARNING: MongoDB pool checkout on {event.address} waited {waited_ms:.0f} ms")
+
+    def connection_check_out_failed(self, event):
+        print(
+            f"WARNING: MongoDB pool checkout on {event.address} failed after "
+            f"{event.duration * 1000:.0f} ms: {event.reason}"
+        )
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+if MONGO_LOG_POOL_WAIT_MS > 0:
+    _client_options["event_listeners"] = [_SlowCheckoutLogger(MONGO_LOG_POOL_WAIT_MS)]
+
+client = AsyncIOMotorClient(MONGO_URI, **_client_options)
 db = client[DB_NAME]
 
 async def get_db():
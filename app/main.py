@@ -1,8 +1,11 @@
 import os
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.api.ask import ask_router
 from app.api.upload import upload_router
 from app.api.super_admin import super_admin_router
@@ -12,11 +15,46 @@ from app.api.company_admin import company_admin_router
 from app.api.webchat import webchat_router
 from app.api.public_chat import router as public_chat_router
 from app.api.maintenance import maintenance_router
+from app.deps.auth import warm_up_keycloak, close_http_client
+from app.deps.db import db
+from app.repositories.indexes import ensure_core_indexes
+from app.middleware.activity_tracker import ActivityTrackerMiddleware, run_activity_flush_loop
+
+
+async def _warm_up():
+    """Prime outbound connections (Keycloak JWKS, MongoDB) and indexes off the request path."""
+    await warm_up_keycloak()
+    try:
+        await db.command("ping")
+    except Exception as e:
+        print(f"WARNING: MongoDB warm-up ping failed: {str(e)}")
+    try:
+        await ensure_core_indexes(db)
+    except Exception as e:
+        print(f"WARNING: Failed to ensure MongoDB indexes: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Run in the background so a slow Keycloak/Mongo does not delay startup
+    warm_up_task = asyncio.create_task(_warm_up())
+    activity_flush_task = asyncio.create_task(run_activity_flush_loop(db))
+    yield
+    warm_up_task.cancel()
+    activity_flush_task.cancel()
+    try:
+        await activity_flush_task
+    except asyncio.CancelledError:
+        pass
+    await close_http_client()
+
 
 app = FastAPI(
     title="MijnDAVI API",
     description="API for answering questions based on documents stored in a vector database.\n\n© 2025 by Rick Hoekman.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,86 +65,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Middleware to track user activity for online user detection
-@app.middleware("http")
-async def track_user_activity(request: Request, call_next):
-    """
-    Track user activity for online user detection.
-    Updates last_activity timestamp when users make authenticated API calls.
-    """
-    # Skip tracking for certain paths
-    skip_paths = ["/docs", "/openapi.json", "/redoc", "/health", "/maintenance-status", "/favicon.ico", "/"]
-    
-    if any(request.url.path.startswith(path) for path in skip_paths):
-        return await call_next(request)
-    
-    # Process request first
-    response = await call_next(request)
-    
-    # Track activity after request (non-blocking)
-    # Extract user from Authorization header if present
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        try:
-            from app.deps.db import db
-            from datetime import datetime
-            import jwt
-            
-            # Get token from header
-            token = auth_header.replace("Bearer ", "")
-            
-            # Decode token to get email (without full validation to avoid circular dependency)
-            try:
-                # Decode without verification (just to get email for activity tracking)
-                unverified_payload = jwt.decode(token, options={"verify_signature": False})
-                user_email = unverified_payload.get("email")
-                
-                if user_email and db:
-                    now = datetime.utcnow()
-                    # Update both collections (non-blocking, fire and forget)
-                    try:
-                        await db.company_admins.update_one(
-                            {"email": user_email},
-                            {"$set": {"last_activity": now}},
-                            upsert=False
-                        )
-                    except:
-                        pass
-                    try:
-                        await db.company_users.update_one(
-                            {"email": user_email},
-                            {"$set": {"last_activity": now}},
-                            upsert=False
-                        )
-                    except:
-                        pass
-            except:
-                # If token decode fails, just skip activity tracking
-                pass
-        except Exception as e:
-            # Don't fail the request if activity tracking fails
-            pass
-    
-    return response
-
-
-# Middleware to handle 413 errors and provide better error messages
-@app.middleware("http")
-async def handle_large_requests(request: Request, call_next):
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        # Check if it's a 413 error or payload too large error
-        error_str = str(e).lower()
-        if "413" in error_str or "payload too large" in error_str or "request entity too large" in error_str:
-            return JSONResponse(
-                status_code=413,
-                content={
-                    "detail": "File too large. Please ensure your reverse proxy (e.g., Nginx) allows uploads larger than 1MB. Contact your administrator to increase client_max_body_size."
-                }
-            )
-        raise
+# Track user activity for online user detection (records last_activity after
+# each tracked response has been sent)
+app.add_middleware(ActivityTrackerMiddleware)
+
+
+def _is_payload_too_large(exc: BaseException) -> bool:
+    """True if ``exc`` (or an exception it wraps) is an upstream HTTP 413."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 413:
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+# Upstream services (RAG indexer, Nextcloud) behind a proxy reject large uploads
+# with 413; httpx raises HTTPStatusError, sometimes wrapped in RuntimeError.
+# Anything else is re-raised and handled as a normal 500.
+@app.exception_handler(httpx.HTTPStatusError)
+@app.exception_handler(RuntimeError)
+async def handle_payload_too_large(request: Request, exc: Exception):
+    if not _is_payload_too_large(exc):
+        raise exc
+    return JSONResponse(
+        status_code=413,
+        content={
+            "detail": "File too large. Please ensure your reverse proxy (e.g., Nginx) allows uploads larger than 1MB. Contact your administrator to increase client_max_body_size."
+        }
+    )
 
 # Create output directory if it doesn't exist
 HIGHLIGHTED_DIR = os.path.join(os.getcwd(), "output", "highlighted")
@@ -5,80 +5,124 @@ Tracks user activity to determine online users.
 Updates last_activity timestamp when users make API calls.
 """
 
+import asyncio
 import logging
+import re
 from datetime import datetime
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
+# last_activity only needs coarse granularity, so writes are coalesced per email
+# and flushed periodically instead of hitting MongoDB on every request.
+ACTIVITY_FLUSH_INTERVAL_SECONDS = 15
+
+_activity_buffer: Dict[str, datetime] = {}
+
+
+def record_activity(email: str, now: Optional[datetime] = None):
+    """
+    Buffer a last_activity timestamp for an email; written on the next flush.
+    Only called from the event loop thread, so no lock is needed.
+    """
+    _activity_buffer[email] = now or datetime.utcnow()
+
+
+async def flush_activity(db):
+    """
+    Write all buffered last_activity timestamps with one bulk_write per collection.
+    """
+    global _activity_buffer
+    if not _activity_buffer:
+        return
+
+    # Swap the buffer before awaiting so new activity lands in a fresh dict
+    pending, _activity_buffer = _activity_buffer, {}
+    ops = [
+        UpdateOne({"email": email}, {"$set": {"last_activity": ts}}, upsert=False)
+        for email, ts in pending.items()
+    ]
+    results = await asyncio.gather(
+        db.company_admins.bulk_write(ops, ordered=False),
+        db.company_users.bulk_write(ops, ordered=False),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.debug(f"Failed to flush user activity: {result}")
+
+
+async def run_activity_flush_loop(db, interval: float = ACTIVITY_FLUSH_INTERVAL_SECONDS):
+    """
+    Flush buffered activity every ``interval`` seconds until cancelled.
+    Pending activity is flushed once more on cancellation (shutdown).
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await flush_activity(db)
+    except asyncio.CancelledError:
+        await flush_activity(db)
+        raise
+
+
+# Paths never tracked: the root, docs, health checks and static files. Compiled
+# into one anchored regex so the check stays a single C-level match as the list
+# grows; each prefix must end at "/" or end-of-path (so "/healthz" is tracked).
+ACTIVITY_SKIP_PREFIXES = (
+    "/docs",
+    "/openapi.json",
+    "/redoc",
+    "/health",
+    "/maintenance-status",
+    "/favicon.ico",
+    "/highlighted",
+)
+_ACTIVITY_SKIP_RE = re.compile(
+    r"^(?:/$|(?:" + "|".join(map(re.escape, ACTIVITY_SKIP_PREFIXES)) + r")(?:/|$))"
+)
 
-class ActivityTrackerMiddleware(BaseHTTPMiddleware):
+
+def _email_from_scope(scope: Scope) -> Optional[str]:
     """
-    Middleware to track user activity for online user detection.
-    
-    Updates last_activity timestamp in MongoDB for authenticated users.
+    Email of the caller, taken from the verified payload get_current_user
+    stored on request.state. Requests that did not authenticate are not tracked.
     """
-    
-    def __init__(self, app: ASGIApp, db=None):
-        super().__init__(app)
-        self.db = db
-    
-    async def dispatch(self, request: Request, call_next):
-        """
-        Track user activity for authenticated requests.
-        """
-        # Skip tracking for certain paths
-        skip_paths = [
-            "/docs",
-            "/openapi.json",
-            "/redoc",
-            "/health",
-            "/favicon.ico",
-        ]
-        
-        if any(request.url.path.startswith(path) for path in skip_paths):
-            return await call_next(request)
-        
-        # Get user from request state (set by auth dependency)
-        user = getattr(request.state, "user", None)
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Update activity if user is authenticated
-        if user and self.db:
-            try:
-                email = user.get("email")
-                if email:
-                    await self._update_user_activity(email, self.db)
-            except Exception as e:
-                # Don't fail the request if activity tracking fails
-                logger.debug(f"Failed to update user activity: {e}")
-        
-        return response
-    
-    async def _update_user_activity(self, email: str, db):
-        """
-        Update last_activity timestamp for a user.
-        """
-        try:
-            now = datetime.utcnow()
-            
-            # Update admin activity
-            await db.company_admins.update_one(
-                {"email": email},
-                {"$set": {"last_activity": now}},
-                upsert=False
-            )
-            
-            # Update user activity
-            await db.company_users.update_one(
-                {"email": email},
-                {"$set": {"last_activity": now}},
-                upsert=False
-            )
-        except Exception as e:
-            logger.debug(f"Error updating activity for {email}: {e}")
+    user = scope.get("state", {}).get("user")
+    if user:
+        return user.get("email")
+    return None
+
+
+class ActivityTrackerMiddleware:
+    """
+    Pure ASGI middleware to track user activity for online user detection.
+
+    Activity is recorded only after the final response body chunk has been
+    sent, so it never adds latency to the response. Unlike BaseHTTPMiddleware
+    there is no extra task or stream per request, and no token is decoded here.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or _ACTIVITY_SKIP_RE.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_track(message: Message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                try:
+                    email = _email_from_scope(scope)
+                    if email:
+                        record_activity(email)
+                except Exception as e:
+                    # Don't fail the request if activity tracking fails
+                    logger.debug(f"Failed to track user activity: {e}")
 
+        await self.app(scope, receive, send_and_track)
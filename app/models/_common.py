@@ -0,0 +1,72 @@
+import re
+
+from pydantic import BaseModel, ConstrainedStr, Extra
+from typing import Dict, Optional
+
+
+# Shape check for emails on admin-authenticated payloads. Unlike EmailStr it
+# does not run email-validator on every request; keep EmailStr for public input.
+_EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+class EmailAddress(ConstrainedStr):
+    """
+    Email with its domain lowercased, the same shape EmailStr stores, so
+    exact-match lookups agree with addresses that came in through EmailStr
+    (e.g. an invite being registered via RegisterRequest).
+    """
+
+    strip_whitespace = True
+    regex = re.compile(_EMAIL_RE)
+
+    @classmethod
+    def __get_validators__(cls):
+        yield from super().__get_validators__()
+        yield cls.lowercase_domain
+
+    @classmethod
+    def lowercase_domain(cls, value: str) -> str:
+        local, _, domain = value.rpartition("@")
+        return f"{local}@{domain.lower()}"
+
+
+class ResponseModel(BaseModel):
+    """Base for response DTOs: immutable once built, unknown fields dropped."""
+
+    class Config:
+        frozen = True
+        extra = Extra.ignore
+
+
+class ModuleConfig(BaseModel):
+    name: str
+    desc: Optional[str] = None 
+    enabled: bool = False
+
+
+# Module payloads keyed by module name, the same shape they are stored in
+ModuleMap = Dict[str, ModuleConfig]
+
+
+def modules_by_name(value):
+    """
+    Pre-validator for ModuleMap fields.
+
+    Accepts the list form clients send ([{"name": ..., "enabled": ...}]) as well
+    as the mapping form ({name: {"enabled": ...}}) and keys both by module name.
+    """
+    if isinstance(value, list):
+        keyed = {}
+        for item in value:
+            if isinstance(item, ModuleConfig):
+                item = item.dict()
+            if not isinstance(item, dict) or not item.get("name"):
+                raise ValueError("each module must be an object with a name")
+            keyed[item["name"]] = item
+        return keyed
+    if isinstance(value, dict):
+        return {
+            name: {**item, "name": name} if isinstance(item, dict) else item
+            for name, item in value.items()
+        }
+    return value
@@ -1,11 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, validator
 from typing import List, Optional, Dict
 import uuid
 
-class ModuleConfig(BaseModel):
-    name: str
-    desc: Optional[str] = None 
-    enabled: bool = False
+from app.models._common import EmailAddress, ModuleConfig, ModuleMap, ResponseModel, modules_by_name
 
 
 class RegisterRequest(BaseModel):
@@ -29,7 +26,9 @@ class CompanyCreate(BaseModel):
 
 
 class CompanyUpdateModules(BaseModel):
-    modules: List[ModuleConfig]
+    modules: ModuleMap
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
 
 class CompanyModulesUpdate(BaseModel):
     modules: dict  # Dictionary mapping module names to their config
@@ -37,20 +36,24 @@ class CompanyModulesUpdate(BaseModel):
 
 class CompanyAddAdmin(BaseModel):
     name: str
-    email: EmailStr
-    modules: List[ModuleConfig]
+    email: EmailAddress
+    modules: ModuleMap
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
 
 class CompanyReAssignAdmin(BaseModel):
     name: str
-    email: EmailStr
+    email: EmailAddress
 
 class CompanyAdminModules(BaseModel):
-    modules: List[ModuleConfig]
+    modules: ModuleMap
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
 
 class AddFoldersPayload(BaseModel):
     folder_names: List[str]
 
-class CompanyOut(BaseModel):
+class CompanyOut(ResponseModel):
     id: str 
     name: str
     admins: List[CompanyAdmin]
@@ -63,14 +66,14 @@ class GuestAccessPayload(BaseModel):
     can_folder_write: bool = False
 
 
-class GuestWorkspacePermissions(BaseModel):
+class GuestWorkspacePermissions(ResponseModel):
     role_write: bool = False
     user_write: bool = False
     document_write: bool = False
     folder_write: bool = False
 
 
-class GuestWorkspaceOut(BaseModel):
+class GuestWorkspaceOut(ResponseModel):
     ownerId: str
     label: str
     permissions: Optional[GuestWorkspacePermissions] = None
@@ -82,7 +85,7 @@ class ImportFoldersPayload(BaseModel):
     import_root: Optional[str] = None  # Optional root path in Nextcloud to list from
 
 
-class FolderImportItem(BaseModel):
+class FolderImportItem(ResponseModel):
     """Represents a folder available for import from Nextcloud."""
     path: str  # Full path relative to storage root
     name: str  # Folder name
@@ -110,7 +113,7 @@ class PublicChatCorrectSourcesRequest(BaseModel):
     regenerate_answer: bool = True
 
 
-class PublicChatOut(BaseModel):
+class PublicChatOut(ResponseModel):
     """Public chat response model."""
     id: str
     chat_name: str
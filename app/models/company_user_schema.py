@@ -1,21 +1,20 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, Field, validator
 from typing import Dict, List
 from typing import Optional
 
-class ModuleConfig(BaseModel):
-    name: str
-    desc: Optional[str] = None 
-    enabled: bool = False
+from app.models._common import EmailAddress, ModuleMap, modules_by_name
 
 class CompanyUserCreate(BaseModel):
-    email: EmailStr
+    email: EmailAddress
     company_role: str
     assigned_role: str
     name: Optional[str] = None  # Optional; when company_role is company_admin, used for display name
-    modules: Optional[List[ModuleConfig]] = None  # When company_role is company_admin, modules the new admin can use
+    modules: Optional[ModuleMap] = None  # When company_role is company_admin, modules the new admin can use
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
 
 class TeamlidPermissionAssign(BaseModel):
-    email: EmailStr
+    email: EmailAddress
     team_permissions: Optional[Dict[str, bool]] = None
     # When PublicChat permission is granted: restrict visibility to these public chat IDs.
     # Omitted/null = unchanged on update; omit on first assign = all chats for that workspace owner.
@@ -25,15 +24,17 @@ class TeamlidPermissionAssign(BaseModel):
 class CompanyUserUpdate(BaseModel):
     id: Optional[str] = None  
     name: Optional[str] = ""  
-    email: EmailStr           
+    email: EmailAddress           
     assigned_roles: List[str] = Field(default_factory=list)
     user_type: str
 
 class CompanyRoleCreate(BaseModel):
     role_name: str = Field(..., example="role_a")
     folders: List[str] = Field(..., example=["bkr", "vgc/kkr", "uur/trc"])
-    modules: List[ModuleConfig]
+    modules: ModuleMap
     action: str
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
     
 class AssignRolePayload(BaseModel):
     user_id: str
@@ -50,7 +51,7 @@ class DeleteRolesPayload(BaseModel):
     role_names: List[str]
 
 class ResetPasswordPayload(BaseModel):
-    email: str
+    email: EmailAddress
 
 class CompanyRoleModifyUsers(BaseModel):
     user_ids: List[str]
@@ -58,5 +59,7 @@ class CompanyRoleModifyUsers(BaseModel):
 
 
 class AssignUserModulesPayload(BaseModel):
-    modules: List[ModuleConfig]
+    modules: ModuleMap
+
+    _modules_by_name = validator("modules", pre=True, allow_reuse=True)(modules_by_name)
 
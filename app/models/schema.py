@@ -1,18 +1,20 @@
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 
+from app.models._common import ResponseModel
+
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=3)
 
-class DocumentResponse(BaseModel):
+class DocumentResponse(ResponseModel):
     content: str
     meta: Dict[str, Any]
     score: Optional[float] = None
 
-class AnswerResponse(BaseModel):
+class AnswerResponse(ResponseModel):
     answer: str
     documents: List[DocumentResponse]
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(ResponseModel):
     detail: str
 
@@ -7,13 +7,14 @@ This module handles all operations related to company admins including:
 - Admin lookup and queries
 """
 
-import copy
+import asyncio
 import logging
 import uuid
 from datetime import datetime
 from typing import Any, Dict, Optional
 from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 
 from app.repositories.base_repo import BaseRepository
 from app.repositories.constants import DEFAULT_MODULES, serialize_modules
@@ -21,6 +22,17 @@ from app.repositories.constants import DEFAULT_MODULES, serialize_modules
 logger = logging.getLogger(__name__)
 
 
+def _project_admin(admin: dict) -> Dict[str, Any]:
+    """Public fields of an admin document, with modules in list form."""
+    return {
+        "user_id": admin["user_id"],
+        "company_id": admin["company_id"],
+        "name": admin["name"],
+        "email": admin["email"],
+        "modules": serialize_modules(admin["modules"]),
+    }
+
+
 class AdminRepository(BaseRepository):
     """Repository for company admin operations."""
     
@@ -51,16 +63,21 @@ class AdminRepository(BaseRepository):
         Raises:
             ValueError: If admin with email already exists
         """
-        if await self.admins.find_one({"company_id": company_id, "email": email}):
-            raise ValueError("Admin with this email already exists")
-        
-        # Get company modules if not provided
+        existing = self.admins.find_one({"company_id": company_id, "email": email}, {"_id": 1})
+        # Get company modules if not provided, overlapping the duplicate check
         if company_modules is None:
             from app.repositories.modules_repo import ModulesRepository
             modules_repo = ModulesRepository(self.db)
-            company_modules = await modules_repo.get_company_modules(company_id)
+            existing, company_modules = await asyncio.gather(
+                existing, modules_repo.get_company_modules(company_id)
+            )
+        else:
+            existing = await existing
+        if existing:
+            raise ValueError("Admin with this email already exists")
         
-        admin_modules = copy.deepcopy(DEFAULT_MODULES)
+        # DEFAULT_MODULES values are flat dicts, so copying each one is enough
+        admin_modules = {k: dict(v) for k, v in DEFAULT_MODULES.items()}
         if modules:
             for k, v in modules.items():
                 if k in admin_modules:
@@ -71,6 +88,7 @@ class AdminRepository(BaseRepository):
                     else:
                         admin_modules[k]["enabled"] = False
         
+        now = datetime.utcnow()
         admin_doc = {
             "company_id": company_id,
             "user_id": str(uuid.uuid4()),
@@ -78,19 +96,14 @@ class AdminRepository(BaseRepository):
             "email": email,
             "added_by_admin_id": admin_id,
             "modules": admin_modules,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": now,
+            "updated_at": now,
         }
         await self.admins.insert_one(admin_doc)
         
-        return {
-            "user_id": admin_doc["user_id"],
-            "company_id": admin_doc["company_id"],
-            "name": admin_doc["name"],
-            "email": admin_doc["email"],
-            "modules": serialize_modules(admin_doc["modules"]),
-            "documents": [],
-        }
+        result = _project_admin(admin_doc)
+        result["documents"] = []
+        return result
     
     async def get_admin_by_id(self, company_id: str, user_id: str) -> Optional[Dict[str, Any]]:
         """Get an admin by company and user ID."""
@@ -143,7 +156,7 @@ class AdminRepository(BaseRepository):
         if existing and existing["user_id"] != admin_id:
             raise ValueError("Admin with this email already exists")
         
-        update_result = await self.admins.update_one(
+        updated_admin = await self.admins.find_one_and_update(
             {"company_id": company_id, "user_id": admin_id},
             {
                 "$set": {
@@ -151,24 +164,17 @@ class AdminRepository(BaseRepository):
                     "email": email,
                     "updated_at": datetime.utcnow(),
                 }
-            }
+            },
+            return_document=ReturnDocument.AFTER,
         )
         
-        if update_result.matched_count == 0:
+        if updated_admin is None:
             raise ValueError("Admin not found")
         
-        updated_admin = await self.admins.find_one({"company_id": company_id, "user_id": admin_id})
+        result = _project_admin(updated_admin)
+        result["documents"] = updated_admin.get("documents", [])
         
         # Convert ObjectId to string if present
-        result = {
-            "user_id": updated_admin["user_id"],
-            "company_id": updated_admin["company_id"],
-            "name": updated_admin["name"],
-            "email": updated_admin["email"],
-            "modules": serialize_modules(updated_admin["modules"]),
-            "documents": updated_admin.get("documents", []),
-        }
-        
         if "_id" in updated_admin:
             result["_id"] = str(updated_admin["_id"])
         
@@ -195,52 +201,63 @@ class AdminRepository(BaseRepository):
         Returns:
             Updated admin details or None if admin not found
         """
-        # Get company modules if not provided
-        if company_modules is None:
-            from app.repositories.modules_repo import ModulesRepository
-            modules_repo = ModulesRepository(self.db)
-            company_modules = await modules_repo.get_company_modules(company_id)
-
         modules = dict(modules)
         if assigner_admin_modules is not None:
             for k in list(modules.keys()):
                 if modules[k].get("enabled") and not assigner_admin_modules.get(k, {}).get("enabled", False):
                     modules[k] = {**modules[k], "enabled": False}
         
-        admin = await self.admins.find_one({"company_id": company_id, "user_id": user_id})
+        admin = self.admins.find_one(
+            {"company_id": company_id, "user_id": user_id},
+            {"_id": 0, "user_id": 1, "company_id": 1, "name": 1, "email": 1, "modules": 1},
+        )
+        # Get company modules if not provided, alongside the admin
+        if company_modules is None:
+            from app.repositories.modules_repo import ModulesRepository
+            modules_repo = ModulesRepository(self.db)
+            admin, company_modules = await asyncio.gather(
+                admin, modules_repo.get_company_modules(company_id)
+            )
+        else:
+            admin = await admin
         if not admin:
             return None
         
         # Initialize modules dict if it doesn't exist
-        if "modules" not in admin or not admin["modules"]:
+        had_modules = bool(admin.get("modules"))
+        if not had_modules:
             admin["modules"] = {}
         
-        # Update or add modules - only allow modules enabled at company level
+        # Update or add modules - only allow modules enabled at company level.
+        # Only the touched enabled flags are written, so module fields this
+        # call doesn't change are never overwritten with what was read here.
+        updates = {}
         for k, v in modules.items():
             company_has_module = company_modules.get(k, {}).get("enabled", False)
             if company_has_module:
                 # Add or update the module
                 if k not in admin["modules"]:
                     admin["modules"][k] = {}
-                admin["modules"][k]["enabled"] = v.get("enabled", False)
+                admin["modules"][k]["enabled"] = updates[k] = v.get("enabled", False)
             else:
                 # Company doesn't have this module enabled, so disable it for admin
                 if k in admin["modules"]:
-                    admin["modules"][k]["enabled"] = False
+                    admin["modules"][k]["enabled"] = updates[k] = False
         
+        if had_modules and not any("." in k or k.startswith("$") for k in updates):
+            update = {f"modules.{k}.enabled": enabled for k, enabled in updates.items()}
+        else:
+            # No modules object to set paths into (or a name unusable as a path)
+            update = {"modules": admin["modules"]}
+        update["updated_at"] = datetime.utcnow()
         await self.admins.update_one(
             {"company_id": company_id, "user_id": user_id},
-            {"$set": {"modules": admin["modules"], "updated_at": datetime.utcnow()}},
+            {"$set": update},
         )
         
-        return {
-            "id": admin["user_id"],
-            "user_id": admin["user_id"],
-            "company_id": admin["company_id"],
-            "name": admin["name"],
-            "email": admin["email"],
-            "modules": serialize_modules(admin["modules"]),
-        }
+        result = _project_admin(admin)
+        result["id"] = admin["user_id"]
+        return result
     
     async def delete_admin(
         self,
@@ -309,45 +326,66 @@ class AdminRepository(BaseRepository):
         try:
             from collections import defaultdict
             
-            roles_cursor = self.roles.find({
-                "company_id": company_id,
-                "added_by_admin_id": admin_id
-            })
-            roles = await roles_cursor.to_list(None)
-            
-            folders_cursor = self.folders.find({
-                "company_id": company_id,
-                "admin_id": admin_id
-            })
-            all_folders = await folders_cursor.to_list(None)
-            folder_names = [folder["name"] for folder in all_folders]
-            
-            if not folder_names:
+            # One round-trip: start from the admin's folders and join the
+            # documents in them, the admin's roles and the admin's users.
+            pipeline = [
+                {"$match": {"company_id": company_id, "admin_id": admin_id}},
+                {"$group": {"_id": None, "folder_names": {"$push": "$name"}}},
+                {
+                    "$lookup": {
+                        "from": self.documents.name,
+                        "localField": "folder_names",
+                        "foreignField": "upload_type",
+                        "pipeline": [
+                            {"$match": {"company_id": company_id, "user_id": admin_id}},
+                            {"$project": {"file_name": 1, "path": 1, "uploaded_at": 1, "created_at": 1, "upload_type": 1}},
+                        ],
+                        "as": "documents",
+                    }
+                },
+                {
+                    "$lookup": {
+                        "from": self.roles.name,
+                        "pipeline": [
+                            {"$match": {"company_id": company_id, "added_by_admin_id": admin_id}},
+                            {"$project": {"_id": 0, "name": 1, "folders": 1}},
+                        ],
+                        "as": "roles",
+                    }
+                },
+                {
+                    "$lookup": {
+                        "from": self.users.name,
+                        "pipeline": [
+                            {"$match": {"company_id": company_id, "added_by_admin_id": admin_id}},
+                            {"$project": {"_id": 0, "user_id": 1, "name": 1, "email": 1, "assigned_roles": 1}},
+                        ],
+                        "as": "users",
+                    }
+                },
+            ]
+            joined = await self.folders.aggregate(pipeline).to_list(1)
+            if not joined:
                 return {}
             
-            docs_cursor = self.documents.find({
-                "company_id": company_id,
-                "user_id": admin_id,
-                "upload_type": {"$in": folder_names}
-            })
-            documents = await docs_cursor.to_list(None)
-            
-            users_cursor = self.users.find({
-                "company_id": company_id,
-                "added_by_admin_id": admin_id
-            })
-            users = await users_cursor.to_list(None)
+            folder_names_set = set(joined[0]["folder_names"])
+            documents = joined[0]["documents"]
+            roles = joined[0]["roles"]
+            users = joined[0]["users"]
             
+            # Role <-> folder links in both directions, from a single pass
             role_folders_map = defaultdict(set)
+            folder_roles_map = defaultdict(set)
             for role in roles:
                 role_name = role["name"]
                 for folder_name in role.get("folders", []):
                     role_folders_map[role_name].add(folder_name)
+                    folder_roles_map[folder_name].add(role_name)
             
             folder_docs_map = defaultdict(list)
             for doc in documents:
                 folder_name = doc.get("upload_type")
-                if folder_name in folder_names:
+                if folder_name in folder_names_set:
                     folder_docs_map[folder_name].append({
                         "file_name": doc.get("file_name"),
                         "path": doc.get("path", ""),
@@ -356,74 +394,53 @@ class AdminRepository(BaseRepository):
                     })
             
             role_users_map = defaultdict(list)
+            role_user_ids = defaultdict(set)
             for user in users:
+                uid = user.get("user_id", "")
                 for role_name in user.get("assigned_roles", []):
-                    user_info = {
-                        "id": user.get("user_id", ""),
+                    if uid in role_user_ids[role_name]:
+                        continue
+                    role_user_ids[role_name].add(uid)
+                    role_users_map[role_name].append({
+                        "id": uid,
                         "name": user.get("name", ""),
                         "email": user.get("email", ""),
-                        "user_id": user.get("user_id", "")
-                    }
-                    existing_user = next((u for u in role_users_map[role_name] if u.get("user_id") == user_info["user_id"]), None)
-                    if not existing_user:
-                        role_users_map[role_name].append(user_info)
-            
-            folder_roles_map = defaultdict(set)
-            for role in roles:
-                role_name = role["name"]
-                for folder_name in role.get("folders", []):
-                    folder_roles_map[folder_name].add(role_name)
+                        "user_id": uid
+                    })
             
-            result = {}
-            # Process roles and their assigned folders
-            for role in roles:
-                role_name = role["name"]
-                role_data = {"folders": []}
-                
-                for folder_name in role_folders_map[role_name]:
-                    folder_docs = folder_docs_map.get(folder_name, [])
-                    
-                    for doc in folder_docs:
-                        all_users_for_folder = []
-                        seen_user_ids = set()
-                        
-                        for role_with_folder in folder_roles_map.get(folder_name, []):
-                            users_in_role = role_users_map.get(role_with_folder, [])
-                            for user in users_in_role:
-                                user_id = user.get("user_id") or user.get("id")
-                                if user_id and user_id not in seen_user_ids:
-                                    seen_user_ids.add(user_id)
-                                    all_users_for_folder.append(user)
-                        
-                        doc["assigned_to"] = all_users_for_folder
-                    
-                    folder_entry = {
+            # Stamp each document once with the users of every role that can see
+            # its folder (none for folders outside any role)
+            unassigned_folders = []
+            for folder_name, folder_docs in folder_docs_map.items():
+                assigned_to = []
+                if folder_name in folder_roles_map:
+                    seen_user_ids = set()
+                    for role_with_folder in folder_roles_map[folder_name]:
+                        for user in role_users_map.get(role_with_folder, []):
+                            user_id = user.get("user_id") or user.get("id")
+                            if user_id and user_id not in seen_user_ids:
+                                seen_user_ids.add(user_id)
+                                assigned_to.append(user)
+                else:
+                    unassigned_folders.append({
                         "name": folder_name,
                         "documents": folder_docs
-                    }
-                    role_data["folders"].append(folder_entry)
-                
-                if role_data["folders"]:
-                    result[role_name] = role_data
+                    })
+                for doc in folder_docs:
+                    doc["assigned_to"] = assigned_to
             
-            folders_in_roles_set = set()
+            result = {}
             for role in roles:
-                for folder_name in role.get("folders", []):
-                    folders_in_roles_set.add(folder_name)
+                role_name = role["name"]
+                folders = [
+                    {"name": folder_name, "documents": folder_docs_map.get(folder_name, [])}
+                    for folder_name in role_folders_map[role_name]
+                ]
+                if folders:
+                    result[role_name] = {"folders": folders}
             
-            for folder_name, folder_docs in folder_docs_map.items():
-                if folder_name not in folders_in_roles_set and folder_docs:
-                    if "Geen rol toegewezen" not in result:
-                        result["Geen rol toegewezen"] = {"folders": []}
-                    
-                    for doc in folder_docs:
-                        doc["assigned_to"] = []
-                    
-                    folder_entry = {
-                        "name": folder_name,
-                        "documents": folder_docs
-                    }
-                    result["Geen rol toegewezen"]["folders"].append(folder_entry)
+            if unassigned_folders:
+                result.setdefault("Geen rol toegewezen", {"folders": []})["folders"].extend(unassigned_folders)
             
             return result
             
@@ -10,6 +10,30 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 
 logger = logging.getLogger(__name__)
 
+# Motor builds a new collection wrapper on every ``db.<name>`` access (~10us
+# each). Repositories are constructed per request, often several per request,
+# so the handles are built once per database object and shared. Keyed by id():
+# Motor delegates __hash__/__eq__ to PyMongo, which costs as much as the lookup
+# saves. The entry keeps its database alive, so the id can't be reused.
+_collections_by_db = {}
+
+
+def _core_collections(db: AsyncIOMotorDatabase) -> dict:
+    entry = _collections_by_db.get(id(db))
+    if entry is not None and entry[0] is db:
+        return entry[1]
+    collections = {
+        "companies": db.companies,
+        "admins": db.company_admins,
+        "users": db.company_users,
+        "roles": db.company_roles,
+        "documents": db.documents,
+        "folders": db.company_folders,
+        "guest_access": db.company_guest_access,
+    }
+    _collections_by_db[id(db)] = (db, collections)
+    return collections
+
 
 class BaseRepository:
     """
@@ -27,11 +51,12 @@ class BaseRepository:
             db: MongoDB database instance (AsyncIOMotorDatabase)
         """
         self.db = db
-        self.companies = db.companies
-        self.admins = db.company_admins
-        self.users = db.company_users
-        self.roles = db.company_roles
-        self.documents = db.documents
-        self.folders = db.company_folders
-        self.guest_access = db.company_guest_access
+        collections = _core_collections(db)
+        self.companies = collections["companies"]
+        self.admins = collections["admins"]
+        self.users = collections["users"]
+        self.roles = collections["roles"]
+        self.documents = collections["documents"]
+        self.folders = collections["folders"]
+        self.guest_access = collections["guest_access"]
 
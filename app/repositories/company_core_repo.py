@@ -4,15 +4,94 @@ Core company repository.
 Handles basic company CRUD operations (create, read, delete, list).
 """
 
-import copy
+import asyncio
 import logging
 import uuid
+from collections import defaultdict
 from datetime import datetime
+from cachetools import TTLCache
 from app.repositories.base_repo import BaseRepository
-from app.repositories.constants import DEFAULT_MODULES, serialize_modules, BASE_DOC_URL
+from app.repositories.constants import DEFAULT_MODULES, default_company_modules, serialize_modules, BASE_DOC_URL
+from app.repositories.modules_repo import invalidate_company_modules
 
 logger = logging.getLogger(__name__)
 
+# Limits of a newly created company, shared by the stored document and the response
+_NEW_COMPANY_LIMITS = {
+    "max_users": -1,  # Default: infinite
+    "max_admins": -1,  # Default: infinite
+    "max_documents": -1,  # Default: infinite
+    "max_roles": -1,  # Default: infinite
+    "max_public_chats": 2,  # Default: 2 QR-Chats per company admin
+}
+
+_NO_COUNTS = {"count": 0, "teamlid": 0, "guests": 0}
+
+# Super-admin company listing (get_all_companies). Each worker process keeps
+# its own copy for at most 30 s, tagged with a generation counter stored in
+# MongoDB. Repository writes bump that counter (announce_companies_listing_change)
+# and every worker checks it before serving its copy, so such changes are seen
+# by all workers on their next request. Writes that bypass the repositories
+# (direct collection updates in routes) only show up once the TTL expires.
+COMPANIES_LISTING_TTL_SECONDS = 30
+_companies_listing = TTLCache(maxsize=1, ttl=COMPANIES_LISTING_TTL_SECONDS)
+_companies_listing_lock = asyncio.Lock()
+_companies_listing_generation = 0
+
+CACHE_GENERATIONS_COLLECTION = "cache_generations"
+_COMPANIES_LISTING_GENERATION_ID = "companies_listing"
+
+
+def invalidate_companies_listing() -> None:
+    """Drop this process's cached company listing and any rebuild already in flight."""
+    global _companies_listing_generation
+    _companies_listing_generation += 1
+    _companies_listing.clear()
+
+
+async def announce_companies_listing_change(db) -> None:
+    """
+    Invalidate the company listing in this and every other worker process.
+    Call after the write has completed; a failure is logged, not raised, so
+    a cache problem never fails the write itself.
+    """
+    invalidate_companies_listing()
+    try:
+        await db[CACHE_GENERATIONS_COLLECTION].update_one(
+            {"_id": _COMPANIES_LISTING_GENERATION_ID},
+            {"$inc": {"generation": 1}},
+            upsert=True,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish company listing invalidation: {e}")
+
+# get_all_companies reads whole collections through small projections; larger
+# batches than the driver default (101 documents first) save getMore round-trips
+_LISTING_BATCH_SIZE = 1000
+
+# Fields get_all_companies reads from each collection
+_COMPANY_LISTING_PROJECTION = {
+    "_id": 0, "company_id": 1, "name": 1, "modules": 1,
+    "max_users": 1, "max_admins": 1, "max_documents": 1, "max_roles": 1, "max_public_chats": 1,
+}
+_ADMIN_LISTING_PROJECTION = {
+    "_id": 0, "company_id": 1, "user_id": 1, "name": 1, "email": 1,
+    "modules": 1, "added_by_admin_id": 1, "is_teamlid": 1,
+}
+_USER_LISTING_PROJECTION = {
+    "_id": 0, "company_id": 1, "user_id": 1, "name": 1, "email": 1,
+    "added_by_admin_id": 1, "is_teamlid": 1,
+}
+
+
+def _modules_key(modules: dict) -> tuple:
+    """Hashable key of the module fields serialize_modules reads."""
+    return tuple(
+        (name, value.get("enabled", False), value.get("desc"))
+        if isinstance(value, dict) else (name, bool(value))
+        for name, value in modules.items()
+    )
+
 
 class CompanyCoreRepository(BaseRepository):
     """Repository for core company operations."""
@@ -30,34 +109,25 @@ class CompanyCoreRepository(BaseRepository):
         now = datetime.utcnow()
         company_id = str(uuid.uuid4())
         # Initialize company with default modules (all disabled)
-        company_modules = copy.deepcopy(DEFAULT_MODULES)
-        for module_name in company_modules:
-            company_modules[module_name]["enabled"] = False
+        company_modules = default_company_modules()
         
         doc = {
             "company_id": company_id,
             "name": name,
-            "max_users": -1,  # Default: infinite
-            "max_admins": -1,  # Default: infinite
-            "max_documents": -1,  # Default: infinite
-            "max_roles": -1,  # Default: infinite
-            "max_public_chats": 2,  # Default: 2 QR-Chats per company admin
+            **_NEW_COMPANY_LIMITS,
             "modules": company_modules,  # Company-level module permissions
             "created_at": now,
             "updated_at": now,
         }
         await self.companies.insert_one(doc)
+        await announce_companies_listing_change(self.db)
         return {
             "id": company_id,
             "name": name,
-            "max_users": -1,
-            "max_admins": -1,
-            "max_documents": -1,
-            "max_roles": -1,
-            "max_public_chats": 2,
+            **_NEW_COMPANY_LIMITS,
             "modules": serialize_modules(company_modules),
-            "created_at": now.isoformat(),
-            "updated_at": now.isoformat(),
+            "created_at": now,
+            "updated_at": now,
         }
 
     async def get_all_companies(self):
@@ -69,98 +139,122 @@ class CompanyCoreRepository(BaseRepository):
             - Company details (id, name, limits, modules)
             - Admins with statistics (admins created, teamlid count, users created, roles created, documents count)
             - Users with documents
+
+        The listing is shared for a short TTL and dropped in every worker when
+        a writer calls ``announce_companies_listing_change``. Treat the
+        returned dict as read-only.
         """
-        companies_cursor = self.companies.find().sort("name", 1)
-        companies = []
+        shared_generation = await self._shared_listing_generation()
+        cached = _companies_listing.get("companies")
+        if cached is not None and cached[0] >= shared_generation:
+            return cached[1]
+        # One rebuild at a time; concurrent callers wait and reuse its result
+        async with _companies_listing_lock:
+            cached = _companies_listing.get("companies")
+            if cached is not None and cached[0] >= shared_generation:
+                return cached[1]
+            generation = _companies_listing_generation
+            listing = await self._load_all_companies()
+            # Don't cache a listing that a concurrent write may have outdated.
+            # Tagged with the generation read before loading, so a write that
+            # lands in another worker meanwhile still forces a rebuild.
+            if generation == _companies_listing_generation:
+                _companies_listing["companies"] = (shared_generation, listing)
+            return listing
+
+    async def _shared_listing_generation(self) -> int:
+        """Listing generation shared by all worker processes (0 before any write)."""
+        doc = await self.db[CACHE_GENERATIONS_COLLECTION].find_one(
+            {"_id": _COMPANIES_LISTING_GENERATION_ID}, {"_id": 0, "generation": 1}
+        )
+        return doc.get("generation", 0) if doc else 0
+
+    async def _load_all_companies(self) -> dict:
+        company_docs = await (
+            self.companies.find({}, _COMPANY_LISTING_PROJECTION)
+            .sort("name", 1)
+            .batch_size(_LISTING_BATCH_SIZE)
+            .to_list(None)
+        )
+        if not company_docs:
+            return {"companies": []}
+        company_ids = [company["company_id"] for company in company_docs]
+
+        # Everything below is loaded for all companies at once, so the listing
+        # costs a fixed number of queries however many companies, admins and
+        # users there are. Keys are (company_id, admin_id/user_id).
+        (
+            admins_by_company,
+            users_by_company,
+            admins_by_creator,
+            users_by_creator,
+            roles_by_creator,
+            docs_by_user,
+        ) = await asyncio.gather(
+            self._group_by_company(self.admins, company_ids, _ADMIN_LISTING_PROJECTION),
+            self._group_by_company(self.users, company_ids, _USER_LISTING_PROJECTION),
+            self._count_by_creator(self.admins, company_ids, with_active_guests=True),
+            self._count_by_creator(self.users, company_ids),
+            self._count_by_creator(self.roles, company_ids),
+            self._documents_by_user(company_ids),
+        )
+
+        # Admins of a company mostly share one module configuration, so each
+        # distinct configuration is serialized once per listing
+        serialized_modules = {}
+
+        def admin_modules(modules: dict) -> list:
+            key = _modules_key(modules)
+            result = serialized_modules.get(key)
+            if result is None:
+                result = serialized_modules[key] = serialize_modules(modules)
+            return result
 
-        async for company in companies_cursor:
+        companies = []
+        for company in company_docs:
             company_id = company["company_id"]
 
-            admins_cursor = self.admins.find({"company_id": company_id})
             admins = []
-            async for admin in admins_cursor:
+            for admin in admins_by_company.get(company_id, []):
                 admin_id = admin["user_id"]
-                # Get all documents uploaded by this admin (private + role assigned + unrole assigned)
-                docs_cursor = self.documents.find({"user_id": admin_id, "company_id": company_id})
-                documents = [
-                    {
-                        "file_name": d["file_name"],
-                        "file_url": f"{BASE_DOC_URL}/{d['user_id']}/{d['file_name']}",
-                        "upload_type": d.get("upload_type", "document"),
-                    }
-                    async for d in docs_cursor
-                ]
-                # Count roles created by this admin
-                roles_count = await self.roles.count_documents({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id
-                })
-                # Count admins created by this admin
-                created_admins_count = await self.admins.count_documents({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id
-                })
-                # Count users created by this admin
-                created_users_count = await self.users.count_documents({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id
-                })
-                # Count teamlid users/admins created by this admin
-                # For users: check is_teamlid and added_by_admin_id
-                teamlid_users_count = await self.users.count_documents({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id,
-                    "is_teamlid": True
-                })
-                # For admins: check if admin has is_teamlid=true and was created by this admin, OR
-                # check guest_access where owner_admin_id = admin_id (teamlid permissions assigned by this admin)
-                teamlid_admins_direct = await self.admins.count_documents({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id,
-                    "is_teamlid": True
-                })
-                teamlid_admins_via_guest = await self.guest_access.count_documents({
-                    "company_id": company_id,
-                    "owner_admin_id": admin_id,
-                    "is_active": True
-                })
-                teamlid_count = teamlid_users_count + teamlid_admins_direct + teamlid_admins_via_guest
+                key = (company_id, admin_id)
+                # All documents uploaded by this admin (private + role assigned + unrole assigned)
+                documents = docs_by_user.get(key, [])
+                created_admins = admins_by_creator.get(key, _NO_COUNTS)
+                created_users = users_by_creator.get(key, _NO_COUNTS)
+                # Teamlids: users/admins with is_teamlid created by this admin, plus
+                # active guest access granted by this admin (teamlid permissions)
+                teamlid_count = (
+                    created_users["teamlid"]
+                    + created_admins["teamlid"]
+                    + created_admins["guests"]
+                )
                 
                 admins.append({
                     "id": admin_id,
                     "user_id": admin_id,
                     "name": admin["name"],
                     "email": admin["email"],
-                    "modules": serialize_modules(admin["modules"]),
+                    "modules": admin_modules(admin["modules"]),
                     "documents": documents,
                     "added_by_admin_id": admin.get("added_by_admin_id"),
                     "is_teamlid": admin.get("is_teamlid", False),
                     "stats": {
-                        "admins_created": created_admins_count,
+                        "admins_created": created_admins["count"],
                         "teamlid_count": teamlid_count,
-                        "users_created": created_users_count,
-                        "roles_created": roles_count,
+                        "users_created": created_users["count"],
+                        "roles_created": roles_by_creator.get(key, _NO_COUNTS)["count"],
                         "documents_count": len(documents),
                     }
                 })
 
-            users_cursor = self.users.find({"company_id": company_id})
             users = []
-            async for user in users_cursor:
-                docs_cursor = self.documents.find({"user_id": user["user_id"], "company_id": company_id})
-                documents = [
-                    {
-                        "file_name": d["file_name"],
-                        "file_url": f"{BASE_DOC_URL}/{d['user_id']}/{d['file_name']}",
-                        "upload_type": d.get("upload_type", "document"),
-                    }
-                    async for d in docs_cursor
-                ]
+            for user in users_by_company.get(company_id, []):
                 users.append({
                     "id": user["user_id"],
                     "name": user["name"],
                     "email": user["email"],
-                    "documents": documents,
+                    "documents": docs_by_user.get((company_id, user["user_id"]), []),
                     "added_by_admin_id": user.get("added_by_admin_id"),
                     "is_teamlid": user.get("is_teamlid", False),
                 })
@@ -169,9 +263,7 @@ class CompanyCoreRepository(BaseRepository):
             company_modules = company.get("modules", DEFAULT_MODULES)
             # If company doesn't have modules yet, initialize with defaults
             if not company_modules:
-                company_modules = copy.deepcopy(DEFAULT_MODULES)
-                for module_name in company_modules:
-                    company_modules[module_name]["enabled"] = False
+                company_modules = default_company_modules()
             
             companies.append({
                 "id": company_id,
@@ -188,6 +280,96 @@ class CompanyCoreRepository(BaseRepository):
 
         return {"companies": companies}
 
+    async def _group_by_company(self, collection, company_ids: list, projection: dict) -> dict:
+        """Records of the given companies as ``{company_id: [doc, ...]}``, in natural order."""
+        by_company = defaultdict(list)
+        cursor = collection.find({"company_id": {"$in": company_ids}}, projection)
+        for doc in await cursor.batch_size(_LISTING_BATCH_SIZE).to_list(None):
+            by_company[doc["company_id"]].append(doc)
+        return by_company
+
+    async def _count_by_creator(
+        self,
+        collection,
+        company_ids: list,
+        with_active_guests: bool = False,
+    ) -> dict:
+        """
+        Count the companies' records per ``(company_id, added_by_admin_id)``.
+
+        Returns ``{(company_id, admin_id): {"count": n, "teamlid": m, "guests": g}}``
+        where ``teamlid`` counts the records with ``is_teamlid: True``. With
+        ``with_active_guests``, ``guests`` counts the active guest-access grants
+        owned by that admin, folded into the same pipeline via ``$unionWith``;
+        otherwise it is 0.
+        """
+        pipeline = [
+            {"$match": {"company_id": {"$in": company_ids}}},
+            {
+                "$group": {
+                    "_id": {"company_id": "$company_id", "admin_id": "$added_by_admin_id"},
+                    "count": {"$sum": 1},
+                    "teamlid": {"$sum": {"$cond": [{"$eq": ["$is_teamlid", True]}, 1, 0]}},
+                    "guests": {"$sum": 0},
+                }
+            },
+        ]
+        if with_active_guests:
+            pipeline += [
+                {
+                    "$unionWith": {
+                        "coll": self.guest_access.name,
+                        "pipeline": [
+                            {"$match": {"company_id": {"$in": company_ids}, "is_active": True}},
+                            {
+                                "$group": {
+                                    "_id": {"company_id": "$company_id", "admin_id": "$owner_admin_id"},
+                                    "count": {"$sum": 0},
+                                    "teamlid": {"$sum": 0},
+                                    "guests": {"$sum": 1},
+                                }
+                            },
+                        ],
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": "$_id",
+                        "count": {"$sum": "$count"},
+                        "teamlid": {"$sum": "$teamlid"},
+                        "guests": {"$sum": "$guests"},
+                    }
+                },
+            ]
+        return {
+            (row["_id"]["company_id"], row["_id"].get("admin_id")): {
+                "count": row["count"],
+                "teamlid": row["teamlid"],
+                "guests": row["guests"],
+            }
+            for row in await collection.aggregate(pipeline).to_list(None)
+        }
+
+    async def _documents_by_user(self, company_ids: list) -> dict:
+        """Documents in listing form, grouped by ``(company_id, uploader user_id)``."""
+        docs_by_user = defaultdict(list)
+        cursor = self.documents.find(
+            {"company_id": {"$in": company_ids}},
+            {"_id": 0, "company_id": 1, "user_id": 1, "file_name": 1, "upload_type": 1},
+        )
+        url_prefix = BASE_DOC_URL + "/"
+        for d in await cursor.batch_size(_LISTING_BATCH_SIZE).to_list(None):
+            user_id = d.get("user_id")
+            file_name = d.get("file_name")
+            if user_id is None or file_name is None:
+                continue
+            docs_by_user[(d["company_id"], user_id)].append({
+                "file_name": file_name,
+                "file_url": f"{url_prefix}{user_id}/{file_name}",
+                "upload_type": d.get("upload_type", "document"),
+            })
+        return docs_by_user
+
     async def delete_company(self, company_id: str) -> bool:
         """
         Delete a company and all associated data.
@@ -198,9 +380,15 @@ class CompanyCoreRepository(BaseRepository):
         Returns:
             True if company was deleted, False otherwise
         """
-        await self.admins.delete_many({"company_id": company_id})
-        await self.users.delete_many({"company_id": company_id})
-        await self.documents.delete_many({"company_id": company_id})
-        result = await self.companies.delete_one({"company_id": company_id})
+        # Independent deletes, issued together. The compose deployments run a
+        # standalone mongod, which does not support multi-document transactions.
+        *_, result = await asyncio.gather(
+            self.admins.delete_many({"company_id": company_id}),
+            self.users.delete_many({"company_id": company_id}),
+            self.documents.delete_many({"company_id": company_id}),
+            self.companies.delete_one({"company_id": company_id}),
+        )
+        invalidate_company_modules(company_id)
+        await announce_companies_listing_change(self.db)
         return result.deleted_count > 0
 
@@ -11,15 +11,18 @@ Architecture:
 - Gradual migration: Methods are migrated incrementally while maintaining compatibility
 """
 
+import asyncio
 import logging
+from datetime import datetime
+from functools import cached_property, wraps
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 # Import domain repositories
 from app.repositories.base_repo import BaseRepository
 from app.repositories.limits_repo import LimitsRepository
-from app.repositories.modules_repo import ModulesRepository
-from app.repositories.company_core_repo import CompanyCoreRepository
+from app.repositories.modules_repo import ModulesRepository, invalidate_company_modules
+from app.repositories.company_core_repo import CompanyCoreRepository, announce_companies_listing_change
 from app.repositories.user_repo import UserRepository
 from app.repositories.admin_repo import AdminRepository
 from app.repositories.role_repo import RoleRepository
@@ -30,6 +33,44 @@ from app.repositories.nextcloud_sync_repo import NextcloudSyncRepository
 logger = logging.getLogger(__name__)
 
 
+def _debug_serialize(obj):
+    """
+    JSON-safe copy of a raw Mongo document for the debug dump: datetimes as
+    ISO strings, every other scalar as its str().
+    """
+    # Exact-type checks first: nearly every node is a plain str, dict or list
+    cls = type(obj)
+    if cls is str:
+        return obj
+    if cls is dict:
+        return {k: _debug_serialize(v) for k, v in obj.items()}
+    if cls is list:
+        return [_debug_serialize(v) for v in obj]
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, dict):
+        return {k: _debug_serialize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_debug_serialize(v) for v in obj]
+    return str(obj)
+
+
+def _changes_companies_listing(method):
+    """
+    Mark a facade write whose effect shows up in the super-admin company
+    listing (limits, modules, admins, users, roles, guest access, documents).
+    The listing is invalidated in every worker once the write has run, also
+    when it failed part-way.
+    """
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            await announce_companies_listing_change(self.db)
+    return wrapper
+
+
 class CompanyRepository(BaseRepository):
     """
     Main repository facade that composes all domain-specific repositories.
@@ -47,17 +88,45 @@ class CompanyRepository(BaseRepository):
     def __init__(self, db: AsyncIOMotorDatabase):
         """Initialize the repository with database connection and compose domain repositories."""
         super().__init__(db)
-        
-        # Initialize domain repositories
-        self._limits_repo = LimitsRepository(db)
-        self._modules_repo = ModulesRepository(db)
-        self._company_core_repo = CompanyCoreRepository(db)
-        self._user_repo = UserRepository(db)
-        self._admin_repo = AdminRepository(db)
-        self._role_repo = RoleRepository(db)
-        self._folder_repo = FolderRepository(db)
-        self._guest_access_repo = GuestAccessRepository(db)
-        self._nextcloud_sync_repo = NextcloudSyncRepository(db)
+    
+    # Domain repositories are built on first use: a facade is created per
+    # request, and each repository wraps every collection on construction.
+    
+    @cached_property
+    def _limits_repo(self) -> LimitsRepository:
+        return LimitsRepository(self.db)
+    
+    @cached_property
+    def _modules_repo(self) -> ModulesRepository:
+        return ModulesRepository(self.db)
+    
+    @cached_property
+    def _company_core_repo(self) -> CompanyCoreRepository:
+        return CompanyCoreRepository(self.db)
+    
+    @cached_property
+    def _user_repo(self) -> UserRepository:
+        return UserRepository(self.db)
+    
+    @cached_property
+    def _admin_repo(self) -> AdminRepository:
+        return AdminRepository(self.db)
+    
+    @cached_property
+    def _role_repo(self) -> RoleRepository:
+        return RoleRepository(self.db)
+    
+    @cached_property
+    def _folder_repo(self) -> FolderRepository:
+        return FolderRepository(self.db)
+    
+    @cached_property
+    def _guest_access_repo(self) -> GuestAccessRepository:
+        return GuestAccessRepository(self.db)
+    
+    @cached_property
+    def _nextcloud_sync_repo(self) -> NextcloudSyncRepository:
+        return NextcloudSyncRepository(self.db)
     
     # ==================== Resource Limits (Migrated) ====================
     
@@ -81,6 +150,7 @@ class CompanyRepository(BaseRepository):
         """Check if adding a role would exceed the limit."""
         return await self._limits_repo.check_roles_limit(company_id, admin_id)
     
+    @_changes_companies_listing
     async def update_company_limits(
         self,
         company_id: str,
@@ -101,6 +171,7 @@ class CompanyRepository(BaseRepository):
         """Get module permissions for a company."""
         return await self._modules_repo.get_company_modules(company_id)
     
+    @_changes_companies_listing
     async def update_company_modules(self, company_id: str, modules: dict) -> dict:
         """Update module permissions for a company."""
         return await self._modules_repo.update_company_modules(company_id, modules)
@@ -125,10 +196,12 @@ class CompanyRepository(BaseRepository):
     
     # ==================== User Operations (Migrated) ====================
     
+    @_changes_companies_listing
     async def add_user(self, company_id: str, name: str, email: str):
         """Create a new company user."""
         return await self._user_repo.add_user(company_id, name, email)
     
+    @_changes_companies_listing
     async def add_user_by_admin(
         self,
         company_id: str,
@@ -142,6 +215,7 @@ class CompanyRepository(BaseRepository):
             company_id, added_by_admin_id, email, company_role, assigned_role
         )
     
+    @_changes_companies_listing
     async def delete_users(
         self,
         company_id: str,
@@ -151,6 +225,7 @@ class CompanyRepository(BaseRepository):
         """Delete users and decrease role user counts."""
         return await self._user_repo.delete_users(company_id, user_ids, admin_id)
     
+    @_changes_companies_listing
     async def delete_users_by_admin(self, company_id: str, admin_id: str, kc_admin=None) -> int:
         """Delete all users added by a specific admin."""
         return await self._user_repo.delete_users_by_admin(company_id, admin_id, kc_admin)
@@ -179,6 +254,7 @@ class CompanyRepository(BaseRepository):
         """Get all documents for a user."""
         return await self._user_repo.get_all_user_documents(email)
     
+    @_changes_companies_listing
     async def update_user(
         self,
         company_id: str,
@@ -201,6 +277,7 @@ class CompanyRepository(BaseRepository):
                 company_id, user_id, name, email, assigned_roles, is_teamlid, teamlid_permissions
             )
     
+    @_changes_companies_listing
     async def assign_teamlid_permissions(
         self,
         company_id: str,
@@ -215,12 +292,14 @@ class CompanyRepository(BaseRepository):
             assigned_public_chat_ids=assigned_public_chat_ids,
         )
     
+    @_changes_companies_listing
     async def remove_teamlid_role(self, company_id: str, admin_id: str, user_id: str) -> bool:
         """Remove teamlid role from a user."""
         return await self._user_repo.remove_teamlid_role(company_id, admin_id, user_id)
     
     # ==================== Admin Operations (Migrated) ====================
     
+    @_changes_companies_listing
     async def add_admin(
         self,
         company_id: str,
@@ -231,20 +310,22 @@ class CompanyRepository(BaseRepository):
         assigner_modules: Optional[dict] = None,
     ):
         """Create a new company admin."""
-        # Get company modules for filtering
-        company_modules = await self._modules_repo.get_company_modules(company_id)
+        # The admin repo fetches company modules alongside its duplicate check
         return await self._admin_repo.create_admin(
-            company_id, admin_id, name, email, modules, company_modules, assigner_modules
+            company_id, admin_id, name, email, modules, assigner_modules=assigner_modules
         )
     
+    @_changes_companies_listing
     async def reassign_admin(self, company_id: str, admin_id: str, name: str, email: str):
         """Update admin information."""
         return await self._admin_repo.update_admin(company_id, admin_id, name, email)
     
+    @_changes_companies_listing
     async def delete_admin(self, company_id: str, user_id: str, admin_id: str = None) -> bool:
         """Delete an admin."""
         return await self._admin_repo.delete_admin(company_id, user_id, admin_id)
     
+    @_changes_companies_listing
     async def assign_modules(
         self,
         company_id: str,
@@ -253,9 +334,8 @@ class CompanyRepository(BaseRepository):
         assigner_admin_modules: Optional[dict] = None,
     ):
         """Assign module permissions to an admin."""
-        company_modules = await self._modules_repo.get_company_modules(company_id)
         return await self._admin_repo.assign_modules(
-            company_id, user_id, modules, company_modules, assigner_admin_modules
+            company_id, user_id, modules, assigner_admin_modules=assigner_admin_modules
         )
     
     async def find_admin_by_email(self, email: str):
@@ -272,6 +352,7 @@ class CompanyRepository(BaseRepository):
     
     # ==================== Role Operations (Migrated) ====================
     
+    @_changes_companies_listing
     async def add_or_update_role(
         self,
         company_id: str,
@@ -282,15 +363,15 @@ class CompanyRepository(BaseRepository):
         action: str = "create"
     ):
         """Add or update a role."""
-        company_modules = await self._modules_repo.get_company_modules(company_id)
         return await self._role_repo.add_or_update_role(
-            company_id, admin_id, role_name, folders, modules, action, company_modules
+            company_id, admin_id, role_name, folders, modules, action
         )
     
     async def list_roles(self, company_id: str, admin_id: str):
         """List all roles for a company/admin."""
         return await self._role_repo.list_roles(company_id, admin_id)
     
+    @_changes_companies_listing
     async def delete_roles(self, company_id: str, role_names: List[str], admin_id: str):
         """Delete roles for a company/admin."""
         return await self._role_repo.delete_roles(company_id, role_names, admin_id)
@@ -303,6 +384,7 @@ class CompanyRepository(BaseRepository):
         """Get a role by name for a specific company and admin."""
         return await self._role_repo.get_role_by_name(company_id, admin_id, role_name)
     
+    @_changes_companies_listing
     async def delete_roles_by_admin(self, company_id: str, admin_id: str) -> int:
         """Delete all roles created by a specific admin."""
         return await self._role_repo.delete_roles_by_admin(company_id, admin_id)
@@ -331,6 +413,7 @@ class CompanyRepository(BaseRepository):
         """Get folders for a company/admin."""
         return await self._folder_repo.get_folders(company_id, admin_id)
     
+    @_changes_companies_listing
     async def delete_folders(
         self,
         company_id: str,
@@ -344,6 +427,7 @@ class CompanyRepository(BaseRepository):
             company_id, folder_names, role_names, admin_id, storage_provider
         )
     
+    @_changes_companies_listing
     async def upload_document_for_folder(
         self,
         company_id: str,
@@ -359,6 +443,7 @@ class CompanyRepository(BaseRepository):
     
     # ==================== Guest Access Operations (Migrated) ====================
     
+    @_changes_companies_listing
     async def upsert_guest_access(
         self,
         company_id: str,
@@ -390,6 +475,7 @@ class CompanyRepository(BaseRepository):
         """Get guest access entry."""
         return await self._guest_access_repo.get_guest_access(company_id, guest_user_id, owner_admin_id)
     
+    @_changes_companies_listing
     async def disable_guest_access(
         self,
         company_id: str,
@@ -401,6 +487,7 @@ class CompanyRepository(BaseRepository):
     
     # ==================== Nextcloud Sync Operations (Migrated) ====================
     
+    @_changes_companies_listing
     async def sync_documents_from_nextcloud(
         self,
         company_id: str,
@@ -415,6 +502,7 @@ class CompanyRepository(BaseRepository):
     
     # ==================== Additional Methods (Migrated) ====================
     
+    @_changes_companies_listing
     async def add_users_from_email_file(
         self,
         company_id: str,
@@ -432,6 +520,7 @@ class CompanyRepository(BaseRepository):
         """Get all private documents for a user/admin."""
         return await self._user_repo.get_all_private_documents(email, document_type)
     
+    @_changes_companies_listing
     async def delete_private_documents(self, email: str, documents_to_delete: List[dict]) -> int:
         """Delete private documents for a user/admin."""
         return await self._user_repo.delete_private_documents(email, documents_to_delete)
@@ -444,14 +533,17 @@ class CompanyRepository(BaseRepository):
         """Get admin with documents by admin user ID."""
         return await self._admin_repo.get_admin_with_documents_by_id(company_id, admin_user_id)
     
+    @_changes_companies_listing
     async def delete_role_documents_by_admin(self, company_id: str, admin_id: str) -> int:
         """Delete all role documents uploaded by a specific admin."""
         return await self._role_repo.delete_role_documents_by_admin(company_id, admin_id)
     
+    @_changes_companies_listing
     async def delete_company_role_documents(self, company_id: str) -> int:
         """Delete all role documents for a company."""
         return await self._role_repo.delete_company_role_documents(company_id)
     
+    @_changes_companies_listing
     async def delete_documents(
         self,
         company_id: str,
@@ -469,42 +561,38 @@ class CompanyRepository(BaseRepository):
     
     async def get_all_collections_data(self) -> dict:
         """Return all documents from all collections (debug method)."""
-        from datetime import datetime
-        
-        companies = await self.companies.find().to_list(None)
-        admins = await self.admins.find().to_list(None)
-        users = await self.users.find().to_list(None)
-        documents = await self.documents.find().to_list(None)
-        roles = await self.roles.find().to_list(None) 
-        folders = await self.folders.find().to_list(None)
-        guests = await self.guest_access.find().to_list(None)
-        
-        def serialize(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            if isinstance(obj, dict):
-                return {k: serialize(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [serialize(v) for v in obj]
-            return str(obj)
+        companies, admins, users, documents, roles, folders, guests = await asyncio.gather(
+            self.companies.find().to_list(None),
+            self.admins.find().to_list(None),
+            self.users.find().to_list(None),
+            self.documents.find().to_list(None),
+            self.roles.find().to_list(None),
+            self.folders.find().to_list(None),
+            self.guest_access.find().to_list(None),
+        )
         
         return {
-            "companies": serialize(companies),
-            "company_admins": serialize(admins),
-            "company_users": serialize(users),
-            "documents": serialize(documents),
-            "roles": serialize(roles),
-            "folders": serialize(folders),
-            "guest_access": serialize(guests)
+            "companies": _debug_serialize(companies),
+            "company_admins": _debug_serialize(admins),
+            "company_users": _debug_serialize(users),
+            "documents": _debug_serialize(documents),
+            "roles": _debug_serialize(roles),
+            "folders": _debug_serialize(folders),
+            "guest_access": _debug_serialize(guests)
         }
     
     async def clear_all_data(self) -> dict:
         """Clear all data from all collections (debug method)."""
-        await self.companies.delete_many({})
-        await self.admins.delete_many({})
-        await self.users.delete_many({})
-        await self.documents.delete_many({})
-        await self.roles.delete_many({})
-        await self.folders.delete_many({})
-        await self.guest_access.delete_many({})
+        # delete_many rather than drop() keeps the indexes from ensure_core_indexes
+        await asyncio.gather(
+            self.companies.delete_many({}),
+            self.admins.delete_many({}),
+            self.users.delete_many({}),
+            self.documents.delete_many({}),
+            self.roles.delete_many({}),
+            self.folders.delete_many({}),
+            self.guest_access.delete_many({}),
+        )
+        invalidate_company_modules()
+        await announce_companies_listing_change(self.db)
         return {"status": "All collections cleared"}
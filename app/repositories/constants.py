@@ -24,6 +24,11 @@ DEFAULT_MODULES = {
 }
 
 
+def default_company_modules() -> dict:
+    """Fresh copy of DEFAULT_MODULES with every module disabled."""
+    return {k: {**v, "enabled": False} for k, v in DEFAULT_MODULES.items()}
+
+
 def serialize_modules(modules: dict) -> list:
     """Serialize module dictionary to list format.
     
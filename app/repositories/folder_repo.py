@@ -825,12 +825,17 @@ class FolderRepository(BaseRepository):
         # Use actual_folder_name from database to ensure it matches what was stored when folder was created
         upload_type_folder_name = actual_folder_name if folder_exists else safe_folder
         
-        existing_doc = await self.documents.find_one({
-            "company_id": company_id,
-            "user_id": admin_id,
-            "upload_type": upload_type_folder_name,
-            "file_name": file_name
-        })
+        # Early exit before any storage work; add_document's DuplicateKeyError
+        # still catches a concurrent upload of the same file
+        existing_doc = await self.documents.find_one(
+            {
+                "company_id": company_id,
+                "user_id": admin_id,
+                "upload_type": upload_type_folder_name,
+                "file_name": file_name,
+            },
+            {"_id": 1},
+        )
 
         if existing_doc:
             raise HTTPException(
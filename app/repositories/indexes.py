@@ -0,0 +1,52 @@
+"""
+MongoDB indexes for the core company collections.
+
+``ensure_core_indexes`` is called once at application startup. ``create_index``
+is idempotent, so re-running it against an existing deployment is cheap.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def ensure_core_indexes(db) -> None:
+    # Auth hot path: get_request_context and activity tracking look users up by
+    # email (optionally narrowed by company_id for multi-company accounts).
+    # Emails are not unique: one person can belong to several companies.
+    await db.company_admins.create_index([("email", 1), ("company_id", 1)])
+    await db.company_users.create_index([("email", 1), ("company_id", 1)])
+    await db.company_users.create_index([("company_id", 1), ("user_id", 1)])
+
+    # get_guest_access / list_guest_workspaces_for_user / upsert_guest_access
+    await db.company_guest_access.create_index(
+        [("company_id", 1), ("guest_user_id", 1), ("owner_admin_id", 1)]
+    )
+
+    # AdminRepository: admins are addressed by (company_id, user_id); a
+    # workspace's roles, folders, users and folder documents are listed per
+    # owning admin (get_admin_documents and friends).
+    await db.company_admins.create_index([("company_id", 1), ("user_id", 1)])
+    await db.company_roles.create_index([("company_id", 1), ("added_by_admin_id", 1)])
+    await db.company_folders.create_index([("company_id", 1), ("admin_id", 1)])
+    await db.documents.create_index(
+        [("company_id", 1), ("user_id", 1), ("upload_type", 1)]
+    )
+
+    # get_all_companies groups admins/users per creator (with a teamlid
+    # sub-count) and active guest grants per owner. The user index also serves
+    # the (company_id, added_by_admin_id) lookups above through its prefix.
+    await db.company_admins.create_index(
+        [("company_id", 1), ("added_by_admin_id", 1), ("is_teamlid", 1)]
+    )
+    await db.company_users.create_index(
+        [("company_id", 1), ("added_by_admin_id", 1), ("is_teamlid", 1)]
+    )
+    await db.company_guest_access.create_index(
+        [("company_id", 1), ("owner_admin_id", 1), ("is_active", 1)]
+    )
+
+    # Company lookups (limits, modules, guest workspace names, super admin
+    # edits) all go by company_id, which create_company assigns as a uuid4.
+    # Created last so a legacy duplicate only costs this one index.
+    await db.companies.create_index([("company_id", 1)], unique=True)
@@ -4,6 +4,7 @@ Resource limits repository.
 Handles all operations related to company resource limits (users, admins, documents, roles).
 """
 
+import asyncio
 import logging
 from datetime import datetime
 from app.repositories.base_repo import BaseRepository
@@ -21,6 +22,20 @@ def effective_max_public_chats_per_admin(max_public_chats: int) -> int:
     return max(0, int(max_public_chats))
 
 
+_LIMIT_FIELDS = ("max_users", "max_admins", "max_documents", "max_roles", "max_public_chats")
+_LIMITS_PROJECTION = {"_id": 0, **dict.fromkeys(_LIMIT_FIELDS, 1)}
+
+# Limit reads currently in flight, by company_id. Concurrent checks for the
+# same company (parallel uploads, bulk adds) await one find_one instead of
+# each issuing their own; nothing is kept once the read completes.
+_limits_in_flight = {}
+
+
+def _forget_limits_read(company_id: str) -> None:
+    """Stop new callers from joining a read that may predate a limits write."""
+    _limits_in_flight.pop(company_id, None)
+
+
 class LimitsRepository(BaseRepository):
     """Repository for managing company resource limits."""
     
@@ -35,22 +50,21 @@ class LimitsRepository(BaseRepository):
             Dictionary with max_users, max_admins, max_documents, max_roles, max_public_chats
             (defaults to -1 for infinite if not set)
         """
-        company = await self.companies.find_one({"company_id": company_id})
-        if not company:
-            return {
-                "max_users": -1,
-                "max_admins": -1,
-                "max_documents": -1,
-                "max_roles": -1,
-                "max_public_chats": -1,
-            }
-        return {
-            "max_users": company.get("max_users", -1),
-            "max_admins": company.get("max_admins", -1),
-            "max_documents": company.get("max_documents", -1),
-            "max_roles": company.get("max_roles", -1),
-            "max_public_chats": company.get("max_public_chats", -1),
-        }
+        pending = _limits_in_flight.get(company_id)
+        if pending is None or pending.get_loop() is not asyncio.get_running_loop():
+            pending = asyncio.ensure_future(
+                self.companies.find_one({"company_id": company_id}, _LIMITS_PROJECTION)
+            )
+            _limits_in_flight[company_id] = pending
+
+            def _done(fut, company_id=company_id):
+                if _limits_in_flight.get(company_id) is fut:
+                    del _limits_in_flight[company_id]
+
+            pending.add_done_callback(_done)
+        # shield: one caller being cancelled must not cancel the shared read
+        company = await asyncio.shield(pending) or {}
+        return {field: company.get(field, -1) for field in _LIMIT_FIELDS}
 
     async def check_users_limit(self, company_id: str) -> tuple[bool, str]:
         """
@@ -219,6 +233,7 @@ class LimitsRepository(BaseRepository):
             {"company_id": company_id},
             {"$set": update_data}
         )
+        _forget_limits_read(company_id)
         
         return await self.get_company_limits(company_id)
 
@@ -7,11 +7,25 @@ Handles all operations related to company and admin module permissions.
 import copy
 import logging
 from datetime import datetime
+from cachetools import TTLCache
 from app.repositories.base_repo import BaseRepository
 from app.repositories.constants import DEFAULT_MODULES, serialize_modules
 
 logger = logging.getLogger(__name__)
 
+# Company-level module config by company_id. It is read on every admin, role
+# and teamlid write but only changes through update_company_modules; other
+# worker processes pick up a change within the TTL.
+_company_modules_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+def invalidate_company_modules(company_id: str = None) -> None:
+    """Drop the cached module config of one company (or of all companies)."""
+    if company_id is None:
+        _company_modules_cache.clear()
+    else:
+        _company_modules_cache.pop(company_id, None)
+
 
 class ModulesRepository(BaseRepository):
     """Repository for managing module permissions."""
@@ -24,12 +38,17 @@ class ModulesRepository(BaseRepository):
             company_id: Company identifier
             
         Returns:
-            Dictionary of module configurations
+            Dictionary of module configurations (shared; do not mutate)
         """
-        company = await self.companies.find_one({"company_id": company_id})
+        modules = _company_modules_cache.get(company_id)
+        if modules is not None:
+            return modules
+        company = await self.companies.find_one({"company_id": company_id}, {"_id": 0, "modules": 1})
         if not company:
             return DEFAULT_MODULES
-        return company.get("modules", DEFAULT_MODULES)
+        modules = company.get("modules", DEFAULT_MODULES)
+        _company_modules_cache[company_id] = modules
+        return modules
 
     async def update_company_modules(self, company_id: str, modules: dict) -> dict:
         """
@@ -48,16 +67,18 @@ class ModulesRepository(BaseRepository):
             if module_name in company_modules:
                 company_modules[module_name]["enabled"] = module_config.get("enabled", False)
         
-        await self.companies.update_one(
+        result = await self.companies.update_one(
             {"company_id": company_id},
             {"$set": {"modules": company_modules, "updated_at": datetime.utcnow()}}
         )
-        
-        # Get updated company to return modules
-        company = await self.companies.find_one({"company_id": company_id})
-        if company:
-            return serialize_modules(company.get("modules", DEFAULT_MODULES))
-        return serialize_modules(DEFAULT_MODULES)
+        if not result.matched_count:
+            invalidate_company_modules(company_id)
+            return serialize_modules(DEFAULT_MODULES)
+
+        # Write through: the stored modules are exactly what we just set, so
+        # the next admin/role write in this process needn't read them back
+        _company_modules_cache[company_id] = company_modules
+        return serialize_modules(company_modules)
 
     def filter_modules_by_company(self, admin_modules: dict, company_modules: dict) -> dict:
         """
@@ -8,12 +8,14 @@ This module handles all role-related operations including:
 - Role counting and statistics
 """
 
+import asyncio
 import logging
 import os
 import shutil
 from datetime import datetime
 from typing import List, Optional
 from fastapi import HTTPException
+from pymongo import UpdateOne
 
 from app.repositories.base_repo import BaseRepository
 from app.repositories.constants import UPLOAD_ROOT
@@ -52,11 +54,21 @@ class RoleRepository(BaseRepository):
         """
         folders = [f.strip("/") for f in folders if f.strip()]
 
-        existing_role = await self.roles.find_one({
+        existing_role = self.roles.find_one({
             "company_id": company_id,
             "added_by_admin_id": admin_id,
             "name": role_name
         })
+        # Company modules (only needed to filter role modules), fetched
+        # alongside the role lookup when not provided
+        if company_modules is None and modules is not None:
+            from app.repositories.modules_repo import ModulesRepository
+            modules_repo = ModulesRepository(self.db)
+            existing_role, company_modules = await asyncio.gather(
+                existing_role, modules_repo.get_company_modules(company_id)
+            )
+        else:
+            existing_role = await existing_role
 
         # Check roles limit only when creating a new role
         if action == "create" and not existing_role:
@@ -81,12 +93,6 @@ class RoleRepository(BaseRepository):
                 "role_name": role_name
             }
 
-        # Get company modules to filter role modules
-        if company_modules is None:
-            from app.repositories.modules_repo import ModulesRepository
-            modules_repo = ModulesRepository(self.db)
-            company_modules = await modules_repo.get_company_modules(company_id)
-        
         modules_dict = None
         if modules is not None:
             if isinstance(modules, list):
@@ -412,30 +418,33 @@ class RoleRepository(BaseRepository):
             roles: List of role names
             user_count: Number of users to add to count (can be negative)
         """
+        if not roles:
+            return
         try:
-            for role_name in roles:
-                existing_role = await self.roles.find_one({
-                    "company_id": company_id,
-                    "added_by_admin_id": admin_id,
-                    "name": role_name
-                })
-                
-                if not existing_role:
-                    logger.debug(f"Role '{role_name}' not found, skipping count update")
-                    continue
-                
-                await self.roles.update_one(
-                    {
-                        "company_id": company_id,
-                        "added_by_admin_id": admin_id,
-                        "name": role_name
-                    },
-                    {
-                        "$inc": {"assigned_user_count": user_count},
-                        "$set": {"updated_at": datetime.utcnow()}
-                    }
-                )
-                logger.debug(f"Updated assigned_user_count for role '{role_name}' by {user_count}")
+            # One bulk write for all roles; a role that doesn't exist simply
+            # matches nothing (no upsert), so no existence check is needed
+            now = datetime.utcnow()
+            result = await self.roles.bulk_write(
+                [
+                    UpdateOne(
+                        {
+                            "company_id": company_id,
+                            "added_by_admin_id": admin_id,
+                            "name": role_name
+                        },
+                        {
+                            "$inc": {"assigned_user_count": user_count},
+                            "$set": {"updated_at": now}
+                        }
+                    )
+                    for role_name in roles
+                ],
+                ordered=False,
+            )
+            logger.debug(
+                f"Updated assigned_user_count by {user_count} for "
+                f"{result.matched_count} of {len(roles)} role(s)"
+            )
                     
         except Exception as e:
             logger.error(f"Error in update_role_user_counts: {e}")
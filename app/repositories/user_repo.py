@@ -18,6 +18,8 @@ from typing import List, Optional
 
 from bson import ObjectId
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pymongo.errors import BulkWriteError
 import pandas as pd
 
 from app.repositories.base_repo import BaseRepository
@@ -46,6 +48,10 @@ def _assigner_has_module(module_name: str, assigner_modules: dict, company_modul
 # Pseudo-roles stored on assigned_roles but not folder/document roles in ``roles`` collection.
 _NON_DOCUMENT_ASSIGNED_ROLES = frozenset({"Teamlid", "Beheerder"})
 
+# Fields get_user_with_documents reads from documents and roles
+_USER_DOCUMENT_PROJECTION = {"_id": 0, "file_name": 1, "upload_type": 1, "path": 1}
+_USER_ROLE_PROJECTION = {"_id": 0, "name": 1, "folders": 1, "modules": 1}
+
 
 def _clamp_teamlid_permissions(
     permissions: dict,
@@ -561,26 +567,29 @@ class UserRepository(BaseRepository):
         user_id = user["user_id"]
         company_id = user["company_id"]
 
-        # Get private documents (upload_type="document")
-        private_docs_query = {
-            "user_id": user_id,
-            "company_id": company_id,
-            "upload_type": "document"
-        }
-        private_docs_cursor = self.documents.find(private_docs_query)
-        private_docs = [d async for d in private_docs_cursor]
-
         role_based_docs = []
+        # Assigned roles of a company user; read once for folders and modules
+        roles = []
         if user_type == "admin":
-            # For company admins: get all documents in folders created by this admin
-            folder_docs_query = {
+            # For company admins: private documents (upload_type="document") plus
+            # all documents in folders created by this admin, in one query
+            own_docs = await self.documents.find(
+                {"user_id": user_id, "company_id": company_id},
+                _USER_DOCUMENT_PROJECTION,
+            ).to_list(None)
+            private_docs = [d for d in own_docs if d.get("upload_type") == "document"]
+            role_based_docs = [d for d in own_docs if d.get("upload_type") != "document"]
+        else:
+            # Get private documents (upload_type="document")
+            private_docs_query = {
                 "user_id": user_id,
                 "company_id": company_id,
-                "upload_type": {"$ne": "document"}
+                "upload_type": "document"
             }
-            folder_docs_cursor = self.documents.find(folder_docs_query)
-            role_based_docs = [d async for d in folder_docs_cursor]
-        else:
+            private_docs = await self.documents.find(
+                private_docs_query, _USER_DOCUMENT_PROJECTION
+            ).to_list(None)
+
             # For company users: get documents from folders assigned via roles
             assigned_roles = user.get("assigned_roles", [])
             added_by_admin_id = user.get("added_by_admin_id")
@@ -591,8 +600,7 @@ class UserRepository(BaseRepository):
                     "added_by_admin_id": added_by_admin_id,
                     "name": {"$in": assigned_roles}
                 }
-                roles_cursor = self.roles.find(roles_query)
-                roles = [r async for r in roles_cursor]
+                roles = await self.roles.find(roles_query, _USER_ROLE_PROJECTION).to_list(None)
                 
                 folder_names = set()
                 for role in roles:
@@ -605,8 +613,9 @@ class UserRepository(BaseRepository):
                         "company_id": company_id,
                         "upload_type": {"$in": list(folder_names)}
                     }
-                    role_based_docs_cursor = self.documents.find(role_based_docs_query)
-                    role_based_docs = [d async for d in role_based_docs_cursor]
+                    role_based_docs = await self.documents.find(
+                        role_based_docs_query, _USER_DOCUMENT_PROJECTION
+                    ).to_list(None)
 
         all_docs = private_docs + role_based_docs
         formatted_docs = [
@@ -669,18 +678,12 @@ class UserRepository(BaseRepository):
             added_by_admin_id = user.get("added_by_admin_id")
             
             if assigned_roles and added_by_admin_id:
-                roles_query = {
-                    "company_id": company_id,
-                    "added_by_admin_id": added_by_admin_id,
-                    "name": {"$in": assigned_roles}
-                }
-                roles_cursor = self.roles.find(roles_query)
-                roles = [r async for r in roles_cursor]
-                
                 from app.repositories.role_constants import COMPANY_USER_ROLE_MODULE_NAMES
 
                 # Aggregate modules from all assigned roles (only modules company users can use in-app)
                 for role in roles:
+                    if role.get("name") in _NON_DOCUMENT_ASSIGNED_ROLES:
+                        continue
                     role_modules = role.get("modules", {})
                     if isinstance(role_modules, dict):
                         for module_name, module_config in role_modules.items():
@@ -1227,38 +1230,12 @@ class UserRepository(BaseRepository):
             from app.repositories.role_repo import RoleRepository
             role_repo = RoleRepository(self.db)
             
-            emails = []
             roles_to_assign = await role_repo.get_roles_to_assign(company_id, admin_id, selected_role)
-            
-            try:
-                if file_extension == '.csv':
-                    df = pd.read_csv(io.BytesIO(file_content))
-                else:
-                    df = pd.read_excel(io.BytesIO(file_content))
-                
-                # Strategy 1: Check column headers
-                for col_name in df.columns:
-                    col_str = str(col_name).strip()
-                    if re.match(r'^[a-zA-Z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$', col_str):
-                        emails.append(col_str)
-                
-                # Strategy 2: Check data cells
-                for col in df.columns:
-                    col_data = df[col].dropna()
-                    if not col_data.empty:
-                        for value in col_data:
-                            value_str = str(value).strip()
-                            if re.match(r'^[a-zA-Z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$', value_str):
-                                emails.append(value_str)
-                
-                # Strategy 3: Text extraction
-                if not emails:
-                    df_text = df.to_string()
-                    emails = self._extract_emails_from_text(df_text)
-                
-            except Exception as file_error:
-                text_content = file_content.decode('utf-8', errors='ignore')
-                emails = self._extract_emails_from_text(text_content)
+
+            # pandas parsing is CPU-bound; keep large sheets off the event loop
+            emails = await run_in_threadpool(
+                self._extract_emails_from_file, file_content, file_extension
+            )
 
             if not emails:
                 raise ValueError("No valid email addresses found in the file.")
@@ -1269,51 +1246,78 @@ class UserRepository(BaseRepository):
                 "duplicates": []
             }
 
-            successful_users = []
+            # One lookup for every address in the file instead of one per row
+            known_user_ids = {}
+            async for existing_user in self.users.find(
+                {"company_id": company_id, "email": {"$in": list(set(emails))}},
+                {"_id": 0, "email": 1, "user_id": 1},
+            ):
+                known_user_ids.setdefault(existing_user["email"], existing_user.get("user_id"))
 
+            now = datetime.utcnow()
+            new_users = []
             for email in emails:
-                try:
-                    existing_user = await self.users.find_one({
-                        "company_id": company_id,
-                        "email": email
+                if email in known_user_ids:
+                    results["duplicates"].append({
+                        "email": email,
+                        "user_id": known_user_ids[email]
                     })
+                    continue
 
-                    if existing_user:
-                        results["duplicates"].append({
-                            "email": email,
-                            "user_id": existing_user.get("user_id")
-                        })
-                        continue
-
-                    name = email.split('@')[0]
+                user_doc = {
+                    "user_id": str(uuid.uuid4()),
+                    "company_id": company_id,
+                    "added_by_admin_id": admin_id,
+                    "email": email,
+                    "name": email.split('@')[0],
+                    "company_role": "company_user",
+                    "assigned_roles": roles_to_assign,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                # Repeats later in the file count as duplicates of this row
+                known_user_ids[email] = user_doc["user_id"]
+                new_users.append(user_doc)
 
-                    user_doc = {
-                        "user_id": str(uuid.uuid4()),
-                        "company_id": company_id,
-                        "added_by_admin_id": admin_id,
-                        "email": email,
-                        "name": name,
-                        "company_role": "company_user",
-                        "assigned_roles": roles_to_assign,
-                        "created_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow(),
+            # All new users in one unordered insert; a failed row doesn't stop the rest
+            insert_errors = {}
+            if new_users:
+                try:
+                    await self.users.insert_many(new_users, ordered=False)
+                except BulkWriteError as e:
+                    for write_error in e.details.get("writeErrors", []):
+                        insert_errors[write_error["index"]] = write_error.get("errmsg", str(e))
+                except Exception as e:
+                    # Unordered: some rows may have been written before the
+                    # failure, so ask the DB which ones actually landed
+                    inserted_ids = {
+                        doc["user_id"]
+                        async for doc in self.users.find(
+                            {"user_id": {"$in": [u["user_id"] for u in new_users]}},
+                            {"_id": 0, "user_id": 1},
+                        )
+                    }
+                    insert_errors = {
+                        index: str(e)
+                        for index, user_doc in enumerate(new_users)
+                        if user_doc["user_id"] not in inserted_ids
                     }
 
-                    await self.users.insert_one(user_doc)
-                    successful_users.append(user_doc)
-
-                    results["successful"].append({
-                        "email": email,
-                        "name": name,
-                        "user_id": user_doc["user_id"],
-                        "assigned_roles": roles_to_assign
-                    })
-
-                except Exception as e:
+            successful_users = []
+            for index, user_doc in enumerate(new_users):
+                if index in insert_errors:
                     results["failed"].append({
-                        "email": email,
-                        "error": str(e)
+                        "email": user_doc["email"],
+                        "error": insert_errors[index]
                     })
+                    continue
+                successful_users.append(user_doc)
+                results["successful"].append({
+                    "email": user_doc["email"],
+                    "name": user_doc["name"],
+                    "user_id": user_doc["user_id"],
+                    "assigned_roles": roles_to_assign
+                })
 
             # Update role user counts
             if successful_users and roles_to_assign:
@@ -1325,6 +1329,40 @@ class UserRepository(BaseRepository):
             logger.error(f"Error processing user upload file: {str(e)}")
             raise
     
+    def _extract_emails_from_file(self, file_content: bytes, file_extension: str) -> List[str]:
+        """Find email addresses in an uploaded CSV/Excel file (runs in a worker thread)."""
+        emails = []
+        try:
+            if file_extension == '.csv':
+                df = pd.read_csv(io.BytesIO(file_content))
+            else:
+                df = pd.read_excel(io.BytesIO(file_content))
+            
+            # Strategy 1: Check column headers
+            for col_name in df.columns:
+                col_str = str(col_name).strip()
+                if re.match(r'^[a-zA-Z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$', col_str):
+                    emails.append(col_str)
+            
+            # Strategy 2: Check data cells
+            for col in df.columns:
+                col_data = df[col].dropna()
+                if not col_data.empty:
+                    for value in col_data:
+                        value_str = str(value).strip()
+                        if re.match(r'^[a-zA-Z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$', value_str):
+                            emails.append(value_str)
+            
+            # Strategy 3: Text extraction
+            if not emails:
+                df_text = df.to_string()
+                emails = self._extract_emails_from_text(df_text)
+            
+        except Exception:
+            text_content = file_content.decode('utf-8', errors='ignore')
+            emails = self._extract_emails_from_text(text_content)
+        return emails
+    
     def _extract_emails_from_text(self, text_content: str) -> List[str]:
         """Extract emails from plain text content."""
         email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'